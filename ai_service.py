@@ -1,12 +1,277 @@
+import functools
 import json
 import os
-from anthropic import Anthropic
-
-client = Anthropic(
-    api_key=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_API_KEY"),
-    base_url=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_BASE_URL")
-)
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+# The anthropic SDK (with httpx and pydantic) takes most of the app's import
+# time, so it is imported and the client built on the first Claude call
+# rather than when a worker boots.
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+# Idle keep-alive connections are kept this long (the SDK default is 5s), so
+# the connection opened by warm_connection() is still there for the first
+# real generation call.
+KEEPALIVE_SECONDS = 300
+
+def get_client():
+    """Return the shared Anthropic client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import anthropic
+                limits = anthropic.DEFAULT_CONNECTION_LIMITS
+                http_client = anthropic.DefaultHttpxClient(limits=type(limits)(
+                    max_connections=limits.max_connections,
+                    max_keepalive_connections=limits.max_keepalive_connections,
+                    keepalive_expiry=KEEPALIVE_SECONDS,
+                ))
+                _client = anthropic.Anthropic(
+                    api_key=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_API_KEY"),
+                    base_url=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_BASE_URL"),
+                    http_client=http_client,
+                )
+    return _client
+
+def get_async_client():
+    """
+    Return the shared AsyncAnthropic client, for the async serving mode
+    (asgi.py). Create it on first use, inside the worker's event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                import anthropic
+                limits = anthropic.DEFAULT_CONNECTION_LIMITS
+                http_client = anthropic.DefaultAsyncHttpxClient(limits=type(limits)(
+                    max_connections=limits.max_connections,
+                    max_keepalive_connections=limits.max_keepalive_connections,
+                    keepalive_expiry=KEEPALIVE_SECONDS,
+                ))
+                _async_client = anthropic.AsyncAnthropic(
+                    api_key=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_API_KEY"),
+                    base_url=os.environ.get("AI_INTEGRATIONS_ANTHROPIC_BASE_URL"),
+                    http_client=http_client,
+                )
+    return _async_client
+
+# ======================
+# SYNC AND ASYNC CALLS
+# ======================
+# Each Claude-backed generate_* function below is written once, as a
+# generator. It yields the messages.create() arguments, gets the response
+# sent back, and returns the parsed result. A failed call is thrown back in
+# at the yield, so the function's own error handling still applies.
+# @claude_call turns it into a plain function that runs on the shared client.
+# The function's .aio attribute is an async twin that awaits the
+# AsyncAnthropic client instead. Both share the prompts and the parsing.
+
+# llm_limiter.init_app() gives each app its own limiter, found through the
+# current app. Every messages.create() below then waits for a lease from it,
+# so all workers together stay under Claude's limits. The limiter is then
+# the only retry layer: the SDK's own retries of 429/529 would run while the
+# lease is held and hide the overload from it.
+
+def current_limiter():
+    """The current app's limiter, or None (limiter off, or outside an app)."""
+    if has_app_context():
+        return current_app.extensions.get('llm_limiter')
+    return None
+
+def create_message(request):
+    """messages.create() on the sync client, through the limiter if there is one."""
+    limiter = current_limiter()
+    if limiter is None:
+        return get_client().messages.create(**request)
+    client = get_client().with_options(max_retries=0)
+    return limiter.call(lambda: client.messages.create(**request), request)
+
+async def create_message_async(request):
+    """messages.create() on the async client, through the limiter if there is one."""
+    limiter = current_limiter()
+    if limiter is None:
+        return await get_async_client().messages.create(**request)
+    client = get_async_client().with_options(max_retries=0)
+    return await limiter.call_async(lambda: client.messages.create(**request), request)
+
+def run_call(steps):
+    """Drive a generate_* generator with the sync client."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = create_message(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+async def run_call_async(steps):
+    """Drive a generate_* generator with the async client."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = await create_message_async(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+def claude_call(generator_function):
+    @functools.wraps(generator_function)
+    def call(*args, **kwargs):
+        return run_call(generator_function(*args, **kwargs))
+
+    @functools.wraps(generator_function)
+    async def aio(*args, **kwargs):
+        return await run_call_async(generator_function(*args, **kwargs))
+
+    call.aio = aio
+    call.steps = generator_function
+    return call
+
+def warm_connection(timeout=5.0):
+    """
+    Open the keep-alive HTTPS connection to the Claude endpoint ahead of the
+    first generation call. It makes one cheap models.list request. Any HTTP
+    answer, errors included, leaves a connection in the pool.
+    Returns True if the endpoint was reached.
+    """
+    import anthropic
+    try:
+        get_client().with_options(max_retries=0, timeout=timeout).models.list(limit=1)
+    except anthropic.APIStatusError:
+        pass
+    except Exception as e:
+        print(f"⚠ Could not pre-connect to Claude: {e}")
+        return False
+    return True
 
+async def warm_connection_async(timeout=5.0):
+    """warm_connection() for the async client."""
+    import anthropic
+    try:
+        await get_async_client().with_options(max_retries=0, timeout=timeout).models.list(limit=1)
+    except anthropic.APIStatusError:
+        pass
+    except Exception as e:
+        print(f"⚠ Could not pre-connect to Claude: {e}")
+        return False
+    return True
+
+# ======================
+# MESSAGE BATCHES
+# ======================
+# Bulk off-peak work (see pregenerate.py) goes through the Message Batches
+# API instead of one messages.create() per item. Batched requests cost half
+# as much and don't count against the synchronous rate limits. They take
+# minutes to hours, so nothing on the request path uses them. run_batch()
+# drives the same generate_* generators as run_call(). It sends each
+# generator's request in a batch and its result back in, so prompts and
+# parsing are shared with the sync and async calls.
+
+# The API accepts up to 100,000 requests (256 MB) per batch.
+BATCH_MAX_REQUESTS = 10000
+BATCH_POLL_SECONDS = 30
+
+class BatchRequestError(Exception):
+    """A batched request that did not succeed (errored, canceled or expired)."""
+
+    def __init__(self, custom_id, result):
+        self.custom_id = custom_id
+        self.result = result
+        error = getattr(result, 'error', None)
+        detail = getattr(getattr(error, 'error', None), 'message', None) or result.type
+        super().__init__(f"Batch request {custom_id} {result.type}: {detail}")
+
+def run_batch(calls, poll_seconds=BATCH_POLL_SECONDS, timeout=24 * 3600, log=print):
+    """
+    Run many generate_* calls through the Message Batches API.
+    `calls` maps a key to (function, args). Returns {key: result}, where
+    each result is what the function would have returned if it had been
+    called directly. A failed request is thrown into its generator, so it
+    gets the function's usual fallback. Requests still unfinished after
+    `timeout` seconds are canceled and fail with TimeoutError. A function
+    that is not a @claude_call (like the fakes the benchmarks install) is
+    simply called.
+    """
+    client = get_client()
+    results = {}
+    pending = {}
+    requests = {}
+    for key, (function, args) in calls.items():
+        if not hasattr(function, 'steps'):
+            results[key] = function(*args)
+            continue
+        steps = function.steps(*args)
+        try:
+            requests[key] = next(steps)
+        except StopIteration as done:
+            results[key] = done.value
+            continue
+        pending[key] = steps
+
+    deadline = time.monotonic() + timeout
+    # A generator may ask for another call after its first answer, so keep
+    # submitting rounds until every generator has returned.
+    while pending:
+        keys = list(pending)
+        custom_ids = {f'call-{n}': key for n, key in enumerate(keys)}
+        batch_ids = []
+        for start in range(0, len(keys), BATCH_MAX_REQUESTS):
+            chunk = list(custom_ids.items())[start:start + BATCH_MAX_REQUESTS]
+            batch = client.messages.batches.create(requests=[
+                {'custom_id': custom_id, 'params': requests[key]} for custom_id, key in chunk
+            ])
+            batch_ids.append(batch.id)
+            log(f"⟳ Submitted batch {batch.id} with {len(chunk)} requests")
+
+        outcomes = {}
+        for batch_id in batch_ids:
+            batch = client.messages.batches.retrieve(batch_id)
+            while batch.processing_status != 'ended':
+                if time.monotonic() >= deadline:
+                    log(f"⚠ Batch {batch_id} still running after {timeout:.0f} s; canceling it")
+                    client.messages.batches.cancel(batch_id)
+                    break
+                time.sleep(poll_seconds)
+                batch = client.messages.batches.retrieve(batch_id)
+            else:
+                counts = batch.request_counts
+                log(f"✓ Batch {batch_id} ended: {counts.succeeded} succeeded, {counts.errored} errored, "
+                    f"{counts.expired} expired, {counts.canceled} canceled")
+                for entry in client.messages.batches.results(batch_id):
+                    outcomes[entry.custom_id] = entry.result
+
+        for custom_id, key in custom_ids.items():
+            steps = pending.pop(key)
+            outcome = outcomes.get(custom_id)
+            try:
+                if outcome is None:
+                    request = steps.throw(TimeoutError(f"Batch request {custom_id} did not finish"))
+                elif outcome.type == 'succeeded':
+                    request = steps.send(outcome.message)
+                else:
+                    request = steps.throw(BatchRequestError(custom_id, outcome))
+            except StopIteration as done:
+                results[key] = done.value
+            else:
+                requests[key] = request
+                pending[key] = steps
+    return results
+
+@claude_call
 def generate_ability_questions(baby_name, age_months, development_goals):
     """
     Generate ability assessment questions using Claude based on baby age and goals.
@@ -46,7 +311,7 @@ Format as JSON:
 Return ONLY valid JSON."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=1500,
             messages=[{"role": "user", "content": prompt}]
@@ -66,6 +331,7 @@ Return ONLY valid JSON."""
         print(f"Response text: {response_text if 'response_text' in locals() else 'No response'}")
         return []
 
+@claude_call
 def generate_personalized_activities(baby_name, age_months, development_goals, ability_assessments):
     """
     Generate personalized activities based on ability assessment results.
@@ -125,7 +391,7 @@ Format as JSON:
 Return ONLY valid JSON."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=2500,
             messages=[{"role": "user", "content": prompt}]
@@ -200,6 +466,7 @@ def generate_activity_image(illustration_prompt, activity_title):
     # This allows the system to work without external dependencies
     return ""
 
+@claude_call
 def generate_development_areas(baby_name, age_months, development_goals):
     """
     Call Claude to generate FUN development areas based on baby age + goals
@@ -287,7 +554,7 @@ EACH AREA MUST HAVE activity_count: 4 (fixed, not variable).
 Return ONLY JSON, no markdown."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
@@ -312,6 +579,7 @@ Return ONLY JSON, no markdown."""
         print(f"Response text: {response_text if 'response_text' in locals() else 'No response'}")
         return []
 
+@claude_call
 def generate_activities_for_area(area_name, area_description, development_type, age_range_min, age_range_max):
     """
     Generate EXACTLY 4 activities for a specific development area
@@ -397,7 +665,7 @@ Format as JSON (ONLY return valid JSON):
 Return ONLY JSON. Must have exactly 4 activities in the array."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=3000,
             messages=[{"role": "user", "content": prompt}]
@@ -420,6 +688,7 @@ Return ONLY JSON. Must have exactly 4 activities in the array."""
         print(f"Response text: {response_text if 'response_text' in locals() else 'No response'}")
         return []
 
+@claude_call
 def generate_challenge_templates():
     """
     Generate 4 parent-child bonding challenge templates (30/90/180/365 days).
@@ -477,7 +746,7 @@ Return as JSON with this structure:
 Return ONLY valid JSON, no markdown formatting."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
@@ -497,6 +766,7 @@ Return ONLY valid JSON, no markdown formatting."""
         print(f"Response text: {response_text if 'response_text' in locals() else 'No response'}")
         return []
 
+@claude_call
 def generate_challenge_daily_activities(challenge_duration, challenge_title, baby_age_months, num_days=10):
     """
     Generate sample daily activities for a challenge.
@@ -533,7 +803,7 @@ Format as JSON:
 Return ONLY valid JSON with exactly {num_days} activities."""
     
     try:
-        response = client.messages.create(
+        response = yield dict(
             model="claude-sonnet-4-5",
             max_tokens=4000,
             messages=[{"role": "user", "content": prompt}]
@@ -551,3 +821,62 @@ Return ONLY valid JSON with exactly {num_days} activities."""
     except Exception as e:
         print(f"Error generating challenge activities: {e}")
         return []
+
+@claude_call
+def generate_daily_activities(age_label, age_months, development_goals, count=3):
+    """
+    Generate `count` different "activity of the day" ideas for every baby in
+    one age bucket with the same development goals. The pre-generation job
+    (pregenerate.py) shares them across the whole group.
+    """
+    goals_text = ', '.join(development_goals) if development_goals else 'all-round development'
+    
+    prompt = f"""Generate {count} different parent-child activities of the day for babies aged {age_label} (about {age_months} months old).
+Parents are focusing on: {goals_text}
+
+Requirements for each activity:
+- 10-15 minute duration
+- Age-appropriate and safe
+- Materials should be common household items
+- Clear, simple instructions
+- Warm, encouraging tone
+- Each activity should feel different from the others
+
+Format as JSON:
+{{
+  "activities": [
+    {{
+      "title": "Peekaboo Surprise",
+      "short_teaser": "Hide, pause, reveal - and watch the giggles!",
+      "what_you_need": "A light scarf or blanket",
+      "full_instructions": "Sit face to face. Cover your face with the scarf, pause, then pull it away with a smile and a cheerful 'peekaboo!'. Repeat, varying the pause.",
+      "why_it_matters": "Builds object permanence and shared joy.",
+      "tips": "Keep the pauses short at first.",
+      "duration": "10-15 min",
+      "goal_focus": "Cognitive",
+      "domain": "Cognitive"
+    }}
+  ]
+}}
+
+Return ONLY valid JSON with exactly {count} activities."""
+    
+    try:
+        response = yield dict(
+            model="claude-sonnet-4-5",
+            max_tokens=600 * count,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        
+        response_text = response.content[0].text.strip()
+        
+        if response_text.startswith('```'):
+            response_text = response_text.split('\n', 1)[1]
+            response_text = response_text.rsplit('```', 1)[0].strip()
+        
+        activities_data = json.loads(response_text)
+        
+        return activities_data['activities']
+    except Exception as e:
+        print(f"Error generating daily activities: {e}")
+        return []
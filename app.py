@@ -1,15 +1,54 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify
 import database
 import ai_service
+import page_cache
+import assets
+import compression
+import completion_buffer
+import llm_limiter
+import migrations
+import profiling
+import pregenerate
+import query_log
+import tracing
+import functools
 import json
 import os
 import random
-from datetime import datetime, date
+import time
+from datetime import datetime, date, timedelta, timezone
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SESSION_SECRET', os.urandom(24).hex())
+# All pages and API routes. create_app() registers them on each app it builds.
+bp = Blueprint('main', __name__)
 
-@app.template_filter('from_json')
+def llm_bound(view):
+    """
+    Mark a view that waits on Claude. The view is written as a generator
+    that yields each Claude call as (ai_service function, args) and is sent
+    back the result. Under WSGI the calls simply run in the worker thread.
+    The async serving mode (asgi.py) runs the same generator on its event
+    loop and awaits each function's async twin (.aio) instead, so one worker
+    can have many generations in flight.
+    """
+    @functools.wraps(view)
+    def run(*args, **kwargs):
+        steps = view(*args, **kwargs)
+        try:
+            step = next(steps)
+            while True:
+                function, call_args = step
+                try:
+                    result = function(*call_args)
+                except Exception as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(result)
+        except StopIteration as done:
+            return done.value
+    run.llm_steps = view
+    return run
+
+@bp.app_template_filter('from_json')
 def from_json_filter(value):
     if isinstance(value, str):
         try:
@@ -18,6 +57,7 @@ def from_json_filter(value):
             return []
     return value if value else []
 
+@tracing.traced
 def get_now_playing():
     """
     Get current 'Now Playing' number.
@@ -38,6 +78,7 @@ def get_now_playing():
     return state['current_now_playing']
 
 
+@tracing.traced
 def update_now_playing():
     """
     Generate a new 'Now Playing' number.
@@ -63,11 +104,13 @@ def refresh_now_playing_if_needed():
     return update_now_playing()
 
 
+@tracing.traced
 def refresh_all_area_now_playing(baby_id):
     """
     Generate new UNIQUE 'now playing' numbers for ALL areas of a baby.
     Called on each /home visit to create freshness and variety.
     Each area gets a different random number (100-999).
+    Returns {area_id (str): number} for filling the cached area cards.
     """
     conn = database.get_db_connection()
     
@@ -79,24 +122,28 @@ def refresh_all_area_now_playing(baby_id):
     
     if not areas:
         conn.close()
-        return
+        return {}
     
     # Generate unique random numbers for all areas
     num_areas = len(areas)
     unique_numbers = random.sample(range(100, 1000), min(num_areas, 900))
     
     # Update each area with unique number
+    numbers = {}
     for area, now_playing in zip(areas, unique_numbers):
         conn.execute(
             'UPDATE development_areas SET now_playing = ? WHERE id = ?',
             (now_playing, area['id'])
         )
+        numbers[str(area['id'])] = now_playing
     
     conn.commit()
     conn.close()
     print(f"DEBUG: Refreshed 'now playing' for {num_areas} areas with unique numbers")
+    return numbers
 
 
+@tracing.traced
 def get_area_now_playing(area_id):
     """
     Get the 'now playing' number for a specific area.
@@ -111,10 +158,18 @@ def get_area_now_playing(area_id):
     
     return area['now_playing'] if area and area['now_playing'] else random.randint(100, 999)
 
-database.init_db()
-database.migrate_add_now_playing_column()
+@tracing.traced
+def get_challenge_cards(challenges_version):
+    """Rendered challenge template cards, shared by every baby and cached per version."""
+    challenges_key = ('challenge_cards', challenges_version)
+    challenge_cards = page_cache.get_fragment(challenges_key)
+    if challenge_cards is None:
+        challenges = database.get_all_challenges()
+        challenge_cards = render_template('_challenge_cards.html', challenges=challenges) if challenges else ''
+        page_cache.set_fragment(challenges_key, challenge_cards)
+    return challenge_cards
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Landing page - show parent entry or redirect to home if session exists"""
     parent_id = session.get('parent_id')
@@ -124,42 +179,42 @@ def index():
     if parent_id and baby_uuid:
         baby = database.get_baby_by_uuid(baby_uuid)
         if baby:
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
     
     # If parent exists but no baby, go to create profile
     if parent_id:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     # No parent - show parent entry screen
     return render_template('parent_entry.html')
 
-@app.route('/parent-entry', methods=['POST'])
+@bp.route('/parent-entry', methods=['POST'])
 def parent_entry():
     """Handle parent contact info submission"""
     contact_info = request.form.get('contact_info', '').strip()
     
     if not contact_info:
         flash('Please enter your mobile number or email', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # Basic validation
     if '@' in contact_info:
         # Email validation
         if not '.' in contact_info or len(contact_info) < 5:
             flash('Please enter a valid email address', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     else:
         # Mobile validation (simple check for digits)
         if not any(char.isdigit() for char in contact_info):
             flash('Please enter a valid mobile number', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     
     # Get or create parent
     parent_id = database.get_or_create_parent(contact_info)
     
     if not parent_id:
         flash('Something went wrong. Please try again.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # Store parent info in session
     session['parent_id'] = parent_id
@@ -173,19 +228,19 @@ def parent_entry():
         most_recent_baby = existing_babies[0]
         session['baby_uuid'] = most_recent_baby['baby_uuid']
         flash(f'Welcome back! 🌿', 'success')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     else:
         # New parent - start onboarding
         flash('Welcome to Nurtura! Let\'s create your first baby profile 🌸', 'success')
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
 
-@app.route('/create-profile', methods=['GET', 'POST'])
+@bp.route('/create-profile', methods=['GET', 'POST'])
 def create_profile():
     """Step 1: Create child profile (name + age group) - requires parent session"""
     # Ensure parent is authenticated
     if not session.get('parent_id'):
         flash('Please enter your contact information first', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == 'POST':
         baby_name = request.form.get('baby_name', '').strip()
@@ -193,33 +248,33 @@ def create_profile():
         
         if not baby_name:
             flash('Please enter your child\'s name', 'error')
-            return redirect(url_for('create_profile'))
+            return redirect(url_for('main.create_profile'))
         
         if not age_group:
             flash('Please select an age group', 'error')
-            return redirect(url_for('create_profile'))
+            return redirect(url_for('main.create_profile'))
         
         # Store profile data in session for step 2
         session['baby_name'] = baby_name
         session['age_group'] = age_group
         
-        return redirect(url_for('select_goals'))
+        return redirect(url_for('main.select_goals'))
     
     return render_template('create_profile.html')
 
-@app.route('/select-goals', methods=['GET', 'POST'])
+@bp.route('/select-goals', methods=['GET', 'POST'])
 def select_goals():
     """Step 2: Select development goals - requires parent and baby data in session"""
     # Check if step 1 was completed
     if 'baby_name' not in session or not session.get('parent_id'):
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     if request.method == 'POST':
         development_goals = request.form.getlist('development_goals')
         
         if not development_goals:
             flash('Please select at least one development goal', 'error')
-            return redirect(url_for('select_goals'))
+            return redirect(url_for('main.select_goals'))
         
         # Create baby profile in database with parent_id
         baby_uuid = database.create_baby(
@@ -238,26 +293,27 @@ def select_goals():
         session.pop('age_group', None)
         
         flash(f'Welcome to Nurtura! 🌸', 'success')
-        return redirect(url_for('loading'))
+        return redirect(url_for('main.loading'))
     
     return render_template('select_goals.html')
 
-@app.route('/loading')
+@bp.route('/loading')
 def loading():
     """Show loading screen immediately - JS will trigger generation"""
     baby_uuid = session.get('baby_uuid')
     
     if not baby_uuid:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(baby_uuid)
     
     if not baby:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     return render_template('loading.html', baby_name=baby['baby_name'])
 
-@app.route('/api/generate-content', methods=['POST'])
+@bp.route('/api/generate-content', methods=['POST'])
+@llm_bound
 def generate_content():
     """API endpoint to trigger AI content generation asynchronously"""
     baby_uuid = session.get('baby_uuid')
@@ -277,25 +333,26 @@ def generate_content():
     if not existing_areas:
         # First visit: Generate areas with AI
         development_goals = json.loads(baby['development_goals'])
-        areas = ai_service.generate_development_areas(
+        areas = yield ai_service.generate_development_areas, (
             baby['baby_name'],
             baby['age_months'],
             development_goals
         )
         
         # Save areas with initial unique now_playing numbers
-        for area in areas:
-            database.save_development_area(
-                baby['id'],
-                area['name'],
-                area['type'],
-                area['age_min'],
-                area['age_max'],
-                area['emoji'],
-                area['color'],
-                area['description'],
-                area['activity_count']
-            )
+        database.save_development_areas(baby['id'], [
+            {
+                'area_name': area['name'],
+                'development_type': area['type'],
+                'age_range_min': area['age_min'],
+                'age_range_max': area['age_max'],
+                'icon_emoji': area['emoji'],
+                'background_color': area['color'],
+                'description': area['description'],
+                'activity_count': area['activity_count'],
+            }
+            for area in areas
+        ])
         
         # Get saved areas and initialize unique now_playing numbers
         existing_areas = database.get_development_areas(baby['id'])
@@ -304,27 +361,29 @@ def generate_content():
         # Generate challenge templates if they don't exist
         challenges = database.get_all_challenges()
         if not challenges:
-            challenge_templates = ai_service.generate_challenge_templates()
-            for template in challenge_templates:
-                database.save_challenge(
-                    template['duration'],
-                    template['title'],
-                    template['tagline'],
-                    template['description'],
-                    template['emoji'],
-                    template['development_types']
-                )
+            challenge_templates = yield ai_service.generate_challenge_templates, ()
+            database.save_challenges([
+                {
+                    'duration_days': template['duration'],
+                    'title': template['title'],
+                    'tagline': template['tagline'],
+                    'description': template['description'],
+                    'cover_image': template['emoji'],
+                    'development_types': template['development_types'],
+                }
+                for template in challenge_templates
+            ])
     
     return jsonify({'success': True, 'ready': True})
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """Clear all session data and return to parent entry"""
     session.clear()
     flash('You\'ve been logged out. Enter your details to continue! 👋', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/home')
+@bp.route('/home')
 def home():
     """
     Show areas screen (homepage) with development areas and challenges for the baby.
@@ -334,62 +393,80 @@ def home():
     parent_id = session.get('parent_id')
     
     if not baby_uuid or not parent_id:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(baby_uuid)
     
     if not baby:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     # Security check: verify baby belongs to current parent
     if baby['parent_id'] and baby['parent_id'] != parent_id:
         session.clear()
         flash('Session mismatch. Please log in again.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
+    
+    # Everything on the page except 'now playing' derives from these versions,
+    # so an unchanged page can be answered with 304 before touching the areas.
+    version = database.get_home_content_version(baby['id'])
+    etag = page_cache.make_etag(
+        'home', baby['id'], parent_id,
+        version['areas_version'], version['challenges_version'], version['enrollments_version'],
+        page_cache.build_id(current_app.template_folder, assets.manifest_version())
+    )
     
-    existing_areas = database.get_development_areas(baby['id'])
+    if page_cache.is_not_modified(etag):
+        return page_cache.not_modified(etag)
     
     # Refresh 'now playing' numbers with UNIQUE values on each visit
-    if existing_areas:
-        refresh_all_area_now_playing(baby['id'])
-        existing_areas = database.get_development_areas(baby['id'])
+    now_playing = refresh_all_area_now_playing(baby['id'])
+    
+    cards_key = ('area_cards', baby['id'], version['areas_version'])
+    area_cards = page_cache.get_fragment(cards_key)
+    if area_cards is None:
+        area_cards = render_template('_area_cards.html',
+                                     areas=database.get_development_areas(baby['id']))
+        page_cache.set_fragment(cards_key, area_cards)
     
-    # Get challenges (should already be generated in loading phase)
-    challenges = database.get_all_challenges()
+    # Challenges are shared templates (should already be generated in loading phase)
+    challenge_cards = get_challenge_cards(version['challenges_version'])
     
     # Get parent's active challenges
     active_challenges = database.get_active_challenges_for_baby(baby['id'])
     
-    return render_template('areas.html', 
-                         baby=baby, 
-                         areas=existing_areas,
-                         challenges=challenges,
-                         active_challenges=active_challenges)
+    page = render_template('areas.html',
+                           baby=baby,
+                           has_areas=bool(now_playing),
+                           area_cards=page_cache.fill_slots(area_cards, 'now_playing', now_playing),
+                           challenge_cards=challenge_cards,
+                           active_challenges=active_challenges)
+    return page_cache.with_etag(page, etag)
 
 
-@app.route('/activities/<int:area_id>')
+@bp.route('/activities/<int:area_id>')
+@llm_bound
 def view_activities(area_id):
     """
     Show task list page with minimal info (icon, title, short description, duration)
     """
     baby_uuid = session.get('baby_uuid')
     if not baby_uuid:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(baby_uuid)
     if not baby:
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     area = database.get_area_by_id(area_id)
     
     if not area or area['baby_id'] != baby['id']:
         flash('Area not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
-    existing_activities = database.get_area_activities(area_id)
+    activities_version = database.get_area_activities_version(area_id)
     
-    if not existing_activities:
-        activities = ai_service.generate_activities_for_area(
+    if activities_version.startswith('0:'):
+        activities = yield ai_service.generate_activities_for_area, (
             area['area_name'],
             area['description'],
             area['development_type'],
@@ -397,91 +474,130 @@ def view_activities(area_id):
             area['age_range_max']
         )
         
-        for activity in activities:
-            database.save_area_activity(
-                area_id,
-                activity['title'],
-                activity['short_description'],
-                json.dumps(activity.get('materials', [])),
-                json.dumps(activity.get('how_to', [])),
-                activity.get('duration_min', 10),
-                activity.get('why_it_helps', ''),
-                activity.get('safety_notes', ''),
-                activity.get('reflection_prompt', ''),
-                activity.get('icon', '🎯')
-            )
+        database.save_area_activities(area_id, [
+            {
+                'activity_title': activity['title'],
+                'short_description': activity['short_description'],
+                'materials': json.dumps(activity.get('materials', [])),
+                'how_to': json.dumps(activity.get('how_to', [])),
+                'duration_min': activity.get('duration_min', 10),
+                'why_it_helps': activity.get('why_it_helps', ''),
+                'safety_notes': activity.get('safety_notes', ''),
+                'reflection_prompt': activity.get('reflection_prompt', ''),
+                'activity_icon': activity.get('icon', '🎯'),
+            }
+            for activity in activities
+        ])
         
-        existing_activities = database.get_area_activities(area_id)
+        activities_version = database.get_area_activities_version(area_id)
     
     # Get completed tasks for today to show checkmarks
     completed_tasks = database.get_completed_task_ids_today(baby['id'])
+    etag = page_cache.make_etag(
+        'tasks', baby['id'], area_id, activities_version, sorted(completed_tasks),
+        page_cache.build_id(current_app.template_folder, assets.manifest_version())
+    )
     
-    return render_template('tasks_list.html', area=area, activities=existing_activities, baby=baby, completed_tasks=completed_tasks)
+    if page_cache.is_not_modified(etag):
+        return page_cache.not_modified(etag)
+    
+    cards_key = ('task_cards', baby['id'], area_id, activities_version, tuple(sorted(completed_tasks)))
+    task_cards = page_cache.get_fragment(cards_key)
+    if task_cards is None:
+        task_cards = render_template('_task_cards.html',
+                                     activities=database.get_area_activities(area_id),
+                                     completed_tasks=completed_tasks)
+        page_cache.set_fragment(cards_key, task_cards)
+    
+    page = render_template('tasks_list.html', area=area, baby=baby, task_cards=task_cards)
+    return page_cache.with_etag(page, etag)
 
-@app.route('/activity/<int:activity_id>')
+@bp.route('/activity/<int:activity_id>')
 def view_activity_detail(activity_id):
     """
     Show full task detail page with timer functionality and completion status.
     """
     if not session.get('baby_uuid'):
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(session.get('baby_uuid'))
     if not baby:
-        return redirect(url_for('onboarding'))
+        return redirect(url_for('main.onboarding'))
     
     activity = database.get_area_activity_by_id(activity_id)
     
     if not activity:
         flash('Activity not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     area = database.get_area_by_id(activity['area_id'])
     
     if not area or area['baby_id'] != baby['id']:
         flash('Activity not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
+    
+    # Check if this task is completed today; the timestamp doubles as the row version
+    last_completed = database.get_last_completion_today(baby['id'], activity_id)
+    completed_today = last_completed is not None
     
-    # Check if this task is completed today
-    completed_today = database.is_task_completed_today(baby['id'], activity_id)
+    etag = page_cache.make_etag(
+        'activity', baby['id'], activity_id, activity['created_at'], last_completed,
+        page_cache.build_id(current_app.template_folder, assets.manifest_version())
+    )
+    last_modified = page_cache.latest(activity['created_at'], last_completed, page_cache.start_of_today())
+    
+    if page_cache.is_not_modified(etag, last_modified):
+        return page_cache.not_modified(etag, last_modified)
     
-    return render_template('task_detail.html', activity=activity, area=area, baby=baby, completed_today=completed_today)
+    page = render_template('task_detail.html', activity=activity, area=area, baby=baby, completed_today=completed_today)
+    return page_cache.with_etag(page, etag, last_modified)
 
-@app.route('/timer/<int:activity_id>')
+@bp.route('/timer/<int:activity_id>')
 def start_timer(activity_id):
     """
     Show timer screen for activity.
     """
     if not session.get('baby_uuid'):
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(session.get('baby_uuid'))
     if not baby:
-        return redirect(url_for('onboarding'))
+        return redirect(url_for('main.onboarding'))
     
     activity = database.get_area_activity_by_id(activity_id)
     
     if not activity:
         flash('Activity not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     area = database.get_area_by_id(activity['area_id'])
     
     if not area or area['baby_id'] != baby['id']:
         flash('Activity not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
+    
+    # The timer page only shows the activity itself, so its row is the whole version
+    etag = page_cache.make_etag(
+        'timer', baby['id'], activity_id, activity['created_at'],
+        page_cache.build_id(current_app.template_folder, assets.manifest_version())
+    )
+    last_modified = page_cache.row_timestamp(activity['created_at'])
+    
+    if page_cache.is_not_modified(etag, last_modified):
+        return page_cache.not_modified(etag, last_modified)
     
     duration_seconds = activity['duration_min'] * 60
     
-    return render_template('timer.html',
-                         activity=activity,
-                         area=area,
-                         baby=baby,
-                         duration_seconds=duration_seconds,
-                         duration_minutes=activity['duration_min'])
+    page = render_template('timer.html',
+                           activity=activity,
+                           area=area,
+                           baby=baby,
+                           duration_seconds=duration_seconds,
+                           duration_minutes=activity['duration_min'])
+    return page_cache.with_etag(page, etag, last_modified)
 
 
-@app.route('/api/mark-task-complete/<int:activity_id>', methods=['POST'])
+@bp.route('/api/mark-task-complete/<int:activity_id>', methods=['POST'])
 def api_mark_task_complete(activity_id):
     """
     API endpoint to mark task as completed.
@@ -504,8 +620,17 @@ def api_mark_task_complete(activity_id):
     if not area or area['baby_id'] != baby['id']:
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
     
-    # Mark task as complete
-    database.mark_task_complete(baby['id'], activity_id, activity['area_id'])
+    # Mark task as complete (group-committed with other taps, see completion_buffer).
+    # Retries of the same tap carry the same key and are not counted twice.
+    key = completion_buffer.dedupe_key(baby['id'], activity_id, request.headers.get('Idempotency-Key'))
+    try:
+        completion_buffer.mark_task_complete(baby['id'], activity_id, activity['area_id'], key)
+    except TimeoutError:
+        # Not known to be committed; a retry with the same Idempotency-Key is safe.
+        response = jsonify({'status': 'error', 'message': 'Could not save right now, please try again',
+                            'retry': True})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     
     # Get updated completion count
     completed_count = database.get_completed_tasks_count_today(baby['id'])
@@ -517,63 +642,69 @@ def api_mark_task_complete(activity_id):
     })
 
 
-@app.route('/challenge/<int:challenge_id>')
+@bp.route('/challenge/<int:challenge_id>')
+@llm_bound
 def view_challenge(challenge_id):
     """
     Get challenge details for modal display.
     Returns JSON with challenge info and sample activities.
     """
     if not session.get('baby_uuid'):
-        return redirect(url_for('create_profile'))
+        return redirect(url_for('main.create_profile'))
     
     baby = database.get_baby_by_uuid(session.get('baby_uuid'))
     if not baby:
-        return redirect(url_for('onboarding'))
+        return redirect(url_for('main.onboarding'))
     
     challenge = database.get_challenge_by_id(challenge_id)
     
     if not challenge:
         flash('Challenge not found', 'error')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     # Get or generate sample activities (first 10 days for preview)
     activities = database.get_challenge_activities(challenge_id, limit=10)
     
     if not activities:
         # Generate sample activities with AI
-        sample_activities = ai_service.generate_challenge_daily_activities(
+        sample_activities = yield ai_service.generate_challenge_daily_activities, (
             challenge['duration_days'],
             challenge['title'],
             baby['age_months'],
-            num_days=10
+            10
         )
         
-        for activity in sample_activities:
-            database.save_challenge_activity(
-                challenge_id,
-                activity['day_number'],
-                activity['title'],
-                activity['description'],
-                json.dumps(activity['materials']),
-                json.dumps(activity['how_to']),
-                activity['why_it_helps'],
-                activity['duration_min']
-            )
+        database.save_challenge_activities(challenge_id, pregenerate.challenge_activity_rows(sample_activities))
         
         activities = database.get_challenge_activities(challenge_id, limit=10)
     
     # Check if already enrolled
     enrolled = database.get_active_challenges_for_baby(baby['id'])
-    is_enrolled = any(e['challenge_id'] == challenge_id for e in enrolled)
+    enrollment = next((e for e in enrolled if e['challenge_id'] == challenge_id), None)
+    is_enrolled = enrollment is not None
+    
+    # Validators cover past enrollments too, so completing or ending one changes them
+    enrollments_version, enrollments_changed_at = database.get_challenge_enrollments_version(baby['id'], challenge_id)
+    last_activity_at = max(a['created_at'] for a in activities) if activities else None
+    etag = page_cache.make_etag(
+        'challenge', baby['id'], challenge_id, challenge['created_at'],
+        len(activities), last_activity_at, enrollments_version,
+        page_cache.build_id(current_app.template_folder, assets.manifest_version())
+    )
+    last_modified = page_cache.latest(challenge['created_at'], last_activity_at, enrollments_changed_at)
     
-    return render_template('challenge_detail.html',
-                         challenge=challenge,
-                         activities=activities,
-                         baby=baby,
-                         is_enrolled=is_enrolled)
+    if page_cache.is_not_modified(etag, last_modified):
+        return page_cache.not_modified(etag, last_modified)
+    
+    page = render_template('challenge_detail.html',
+                           challenge=challenge,
+                           activities=activities,
+                           baby=baby,
+                           is_enrolled=is_enrolled)
+    return page_cache.with_etag(page, etag, last_modified)
 
 
-@app.route('/api/enroll-challenge/<int:challenge_id>', methods=['POST'])
+@bp.route('/api/enroll-challenge/<int:challenge_id>', methods=['POST'])
 def api_enroll_challenge(challenge_id):
     """
     API endpoint to enroll baby in a challenge.
@@ -600,11 +731,159 @@ def api_enroll_challenge(challenge_id):
     })
 
 
-@app.route('/coming-soon')
+@bp.route('/api/log-challenge-day/<int:enrollment_id>', methods=['POST'])
+def api_log_challenge_day(enrollment_id):
+    """
+    API endpoint to log today's day of a challenge.
+    Optional JSON body: {"reflection_notes": "..."}. Logging twice is harmless.
+    """
+    if not session.get('baby_uuid'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    baby = database.get_baby_by_uuid(session.get('baby_uuid'))
+    if not baby:
+        return jsonify({'status': 'error', 'message': 'No baby found'}), 404
+
+    enrollment = database.get_challenge_enrollment(enrollment_id)
+    if not enrollment or enrollment['baby_id'] != baby['id']:
+        return jsonify({'status': 'error', 'message': 'Enrollment not found'}), 404
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+    notes = payload.get('reflection_notes')
+    progress = database.log_challenge_day(enrollment_id, notes)
+    if progress is None:
+        return jsonify({'status': 'error', 'message': 'This challenge is no longer active'}), 409
+
+    return jsonify({
+        'status': 'success',
+        'message': f"Day {progress['current_day']} done!" if progress['newly_logged'] else 'Already logged today',
+        'progress': progress
+    })
+
+
+@bp.route('/api/challenge-progress')
+def api_challenge_progress():
+    """Progress of every active challenge for the current baby."""
+    if not session.get('baby_uuid'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    baby = database.get_baby_by_uuid(session.get('baby_uuid'))
+    if not baby:
+        return jsonify({'status': 'error', 'message': 'No baby found'}), 404
+
+    return jsonify({
+        'status': 'success',
+        'challenges': database.get_active_challenges_for_baby(baby['id'])
+    })
+
+
+def progress_streaks(days):
+    """
+    Current and longest streak of consecutive days, from ISO dates newest
+    first. The current streak is still alive if the last completion was
+    yesterday.
+    """
+    parsed = [date.fromisoformat(day[:10]) for day in days]
+    current = None
+    longest = run = 0
+    for index, day in enumerate(parsed):
+        if index and parsed[index - 1] - day == timedelta(days=1):
+            run += 1
+        else:
+            if index and current is None:
+                current = run  # the newest run just ended
+            run = 1
+        longest = max(longest, run)
+    if current is None:
+        current = run
+    
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    if not parsed or parsed[0] < yesterday:
+        current = 0
+    return {'current': current, 'longest': longest}
+
+
+@bp.route('/api/progress')
+def api_progress():
+    """
+    Daily progress for the current baby over the last ?days=N days (7 by
+    default, at most 366), read from the daily_progress rollup only.
+    """
+    if not session.get('baby_uuid'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+    
+    baby = database.get_baby_by_uuid(session.get('baby_uuid'))
+    if not baby:
+        return jsonify({'status': 'error', 'message': 'No baby found'}), 404
+    
+    num_days = min(max(request.args.get('days', 7, type=int), 1), 366)
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=num_days - 1)
+    
+    days = {(start + timedelta(days=i)).isoformat(): {'completions': 0, 'minutes': 0, 'areas': {}}
+            for i in range(num_days)}
+    by_area = {}
+    for row in database.get_daily_progress(baby['id'], start.isoformat(), today.isoformat()):
+        day = days.get(str(row['day'])[:10])
+        if day is None:
+            continue  # outside the requested window
+        day['completions'] += row['completions']
+        day['minutes'] += row['minutes']
+        day['areas'][row['area_id']] = {'completions': row['completions'], 'minutes': row['minutes']}
+        area = by_area.setdefault(row['area_id'], {'completions': 0, 'minutes': 0})
+        area['completions'] += row['completions']
+        area['minutes'] += row['minutes']
+    
+    return jsonify({
+        'status': 'success',
+        'days': [dict(day, date=key) for key, day in days.items()],
+        'by_area': by_area,
+        'totals': {
+            'completions': sum(day['completions'] for day in days.values()),
+            'minutes': sum(day['minutes'] for day in days.values()),
+        },
+        'streak': progress_streaks(database.get_progress_days(baby['id'])),
+    })
+
+
+@bp.route('/api/daily-activity')
+@llm_bound
+def api_daily_activity():
+    """
+    Today's activity of the day for the current baby. It is normally
+    pre-generated off-peak (pregenerate.py), and generated here only for a
+    baby that the run missed.
+    """
+    if not session.get('baby_uuid'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    baby = database.get_baby_by_uuid(session.get('baby_uuid'))
+    if not baby:
+        return jsonify({'status': 'error', 'message': 'No baby found'}), 404
+
+    activity = database.get_daily_activity(baby['id'])
+    if not activity:
+        label, months = pregenerate.age_bucket(baby['age_months'])
+        generated = yield ai_service.generate_daily_activities, (label, months, list(pregenerate.goals_of(baby)), 1)
+        if not generated:
+            return jsonify({'status': 'error', 'message': 'Could not generate an activity'}), 503
+        database.save_daily_activities([
+            pregenerate.daily_activity_row(baby['id'], baby['parent_id'], date.today(), label, generated[0])
+        ])
+        activity = database.get_daily_activity(baby['id'])
+
+    return jsonify({'status': 'success', 'activity': dict(activity)})
+
+
+@bp.route('/coming-soon')
 def coming_soon():
     return render_template('coming_soon.html')
 
-@app.route('/debug/now-playing')
+@bp.route('/debug/now-playing')
 def debug_now_playing():
     """Show current 'Now Playing' number"""
     now_playing = get_now_playing()
@@ -616,7 +895,7 @@ def debug_now_playing():
     })
 
 
-@app.route('/debug/now-playing/refresh')
+@bp.route('/debug/now-playing/refresh')
 def debug_refresh_now_playing():
     """Manually refresh to see it change"""
     new_number = refresh_now_playing_if_needed()
@@ -626,7 +905,7 @@ def debug_refresh_now_playing():
     })
 
 
-@app.route('/debug/now-playing/set/<int:number>')
+@bp.route('/debug/now-playing/set/<int:number>')
 def debug_set_now_playing(number):
     """Set a specific number (for testing)"""
     if not (101 <= number <= 999):
@@ -646,7 +925,7 @@ def debug_set_now_playing(number):
     })
 
 
-@app.route('/debug/area-now-playing')
+@bp.route('/debug/area-now-playing')
 def debug_area_now_playing():
     """
     Show 'now playing' numbers for all areas (per-area unique numbers)
@@ -676,7 +955,7 @@ def debug_area_now_playing():
     })
 
 
-@app.route('/debug/area-now-playing/refresh')
+@bp.route('/debug/area-now-playing/refresh')
 def debug_refresh_area_now_playing():
     """
     Manually refresh area now playing numbers (for testing)
@@ -709,5 +988,67 @@ def debug_refresh_area_now_playing():
         'total_areas': len(after)
     })
 
+def warm_up(app, connect_llm=True):
+    """
+    Pay a worker's cold-start costs before it takes traffic. This compiles
+    every Jinja template, reads the hot tables into the OS page cache, renders
+    the shared challenge cards and opens the keep-alive connection to Claude.
+    Called from gunicorn's post_worker_init hook (gunicorn.conf.py).
+    The database steps are skipped until migrations have run, and a failed
+    warm-up is only reported: the worker still starts and serves.
+    """
+    started = time.perf_counter()
+    try:
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        
+        with app.test_request_context():
+            assets.inline_css('css/critical.css')
+            page_cache.build_id(app.template_folder, assets.manifest_version())
+            if migrations.schema_is_current():
+                get_challenge_cards(database.get_challenges_version())
+                database.warm_page_cache()
+            else:
+                print(f"⚠ Worker {os.getpid()}: database migrations pending, skipping the database warm-up")
+        
+        connected = ai_service.warm_connection() if connect_llm else False
+    except Exception as e:
+        print(f"⚠ Worker {os.getpid()} warm-up failed: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"✓ Worker {os.getpid()} warmed up in {elapsed_ms:.0f} ms"
+          f"{' (Claude connection open)' if connected else ''}")
+
+def create_app(config=None):
+    """
+    Build a configured app. `config` overrides the defaults, e.g.
+    create_app({'DATABASE_URL': 'sqlite:///:memory:'}) for a throwaway
+    database. NURTURA_DATABASE_URL sets the default for deployments.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SESSION_SECRET', os.urandom(24).hex())
+    app.config.update(config or {})
+    
+    database.init_app(app)
+    tracing.init_app(app)
+    page_cache.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    completion_buffer.init_app(app)
+    migrations.init_app(app)
+    profiling.init_app(app)
+    query_log.init_app(app)
+    llm_limiter.init_app(app)
+    pregenerate.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
+# The default app, for `gunicorn app:app` and `flask --app app`.
+app = create_app()
+
 if __name__ == '__main__':
+    # Local development: bring the database up to date before serving.
+    # Deployments run `flask --app app migrate` as a separate step.
+    with app.app_context():
+        migrations.migrate()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,226 @@
+"""
+ASGI entry point, which serves the Claude-bound routes asynchronously.
+
+    uvicorn asgi:app --workers 2
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 asgi:app
+
+The views marked @llm_bound in app.py (generate_content, view_activities,
+view_challenge and api_daily_activity) run as tasks on the worker's event loop. Their Claude calls
+await the shared AsyncAnthropic client, so one worker can have hundreds of
+generations in flight, where the sync deployment needs a thread for each.
+Only those awaits run on the loop. The request hooks, the view's code
+between Claude calls (its database work) and the response finalizing
+(compression included) run on a pool of NURTURA_ASGI_THREADS threads (16 by
+default), so a slow SQLite write or a large page never stalls the other
+generations. Every other route goes to the Flask WSGI app on the same pool.
+
+The ASGI server is not a dependency of the sync deployment. Install uvicorn
+(or any other ASGI 3 server) only for this mode.
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+import ai_service
+import app as app_module
+
+
+def wsgi_environ(scope, body):
+    """The WSGI environ for an ASGI http scope and its request body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def advance(resume, *args):
+    """
+    Resume a view generator. Returns (False, the next step) or (True, the
+    view's return value), since StopIteration can't cross a Future.
+    """
+    try:
+        return False, resume(*args)
+    except StopIteration as done:
+        return True, done.value
+
+
+async def run_steps(steps, in_thread=asyncio.to_thread, in_loop=None):
+    """
+    Drive an @llm_bound view generator. Each Claude call awaits the
+    function's async twin. A function without one (such as the canned
+    generators the benchmarks install) runs through in_thread instead, like
+    the generator's own code between calls. in_loop, if given, wraps each
+    async twin's coroutine (AsyncApp runs it in the request's context).
+    """
+    finished, step = await in_thread(advance, next, steps)
+    while not finished:
+        function, call_args = step
+        try:
+            if hasattr(function, 'aio'):
+                call = function.aio(*call_args)
+                result = await (in_loop(call) if in_loop else call)
+            else:
+                result = await in_thread(function, *call_args)
+        except Exception as e:
+            finished, step = await in_thread(advance, steps.throw, e)
+        else:
+            finished, step = await in_thread(advance, steps.send, result)
+    return step
+
+
+class AsyncApp:
+    """ASGI 3 application around a Flask app built by create_app()."""
+
+    def __init__(self, flask_app, threads=16):
+        self.flask_app = flask_app
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = wsgi_environ(scope, body)
+
+        if self.is_llm_bound(environ):
+            status, headers, content = await self.call_llm_view(environ)
+        else:
+            loop = asyncio.get_running_loop()
+            status, headers, content = await loop.run_in_executor(self.pool, self.call_wsgi, environ)
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await asyncio.to_thread(app_module.warm_up, self.flask_app, connect_llm=False)
+                if os.environ.get('NURTURA_WARM_LLM', '1') != '0':
+                    await ai_service.warm_connection_async()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def is_llm_bound(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        return hasattr(self.flask_app.view_functions.get(endpoint), 'llm_steps')
+
+    def call_wsgi(self, environ):
+        """Run the WSGI app in a pool thread. Returns (status, headers, body)."""
+        started = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+            return chunks.append
+
+        result = self.flask_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], b''.join(chunks)
+
+    async def call_llm_view(self, environ):
+        """
+        Flask's wsgi_app and full_dispatch_request, with the view itself
+        awaited. Flask, tracing and the limiter lookup keep their state in
+        contextvars, so every step of the request, on the pool or on the
+        loop, runs in one Context of its own. A Context can only be entered
+        once at a time, so the steps run strictly one after another, and a
+        cancelled request waits for its running step before the teardown.
+        """
+        flask_app = self.flask_app
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        running = []
+
+        def in_thread(function, *args):
+            running[:] = [loop.run_in_executor(self.pool, context.run, function, *args)]
+            return asyncio.shield(running[0])
+
+        def in_loop(coroutine):
+            running[:] = [asyncio.create_task(coroutine, context=context)]
+            return running[0]
+
+        def response_tuple(response):
+            return response.status_code, list(response.headers.items()), response.get_data()
+
+        environ['nurtura.async_view'] = True
+        ctx = flask_app.request_context(environ)
+        await in_thread(ctx.push)
+        error = None
+        try:
+            try:
+                try:
+                    rv = await in_thread(flask_app.preprocess_request)
+                    if rv is None:
+                        view = flask_app.view_functions[ctx.request.url_rule.endpoint]
+                        rv = await run_steps(view.llm_steps(**ctx.request.view_args), in_thread, in_loop)
+                except Exception as e:
+                    rv = await in_thread(flask_app.handle_user_exception, e)
+                response = await in_thread(flask_app.finalize_request, rv)
+            except Exception as e:
+                error = e
+                response = await in_thread(flask_app.handle_exception, e)
+            return await in_thread(response_tuple, response)
+        finally:
+            await asyncio.shield(self.teardown(running, in_thread, ctx, error))
+
+    async def teardown(self, running, in_thread, ctx, error):
+        """Pop the request context once the request's last step has finished."""
+        try:
+            await running[0]
+        except BaseException:
+            pass
+        await in_thread(ctx.pop, error)
+
+
+app = AsyncApp(app_module.app, threads=int(os.environ.get('NURTURA_ASGI_THREADS', 16)))
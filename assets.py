@@ -0,0 +1,339 @@
+"""
+Static asset pipeline.
+
+Build step (run once per deploy, output goes to static/dist/):
+
+    python assets.py build [--font-dir DIR]
+
+- Fonts: Poppins, Nunito and Inter are vendored as Latin-subset WOFF2 with a
+  local fonts.css, so pages stop depending on fonts.googleapis.com.
+- CSS: every stylesheet is copied under a content-hash filename and served
+  with a far-future, immutable Cache-Control.
+- Every text asset also gets precompressed .gz (and .br when brotli is
+  installed) siblings, picked per request from Accept-Encoding.
+
+At runtime templates call asset_url('style.css'); without a build (or for
+names missing from the manifest) it falls back to the plain /static file,
+and fonts fall back to Google Fonts.
+
+fontTools is only needed for the build, and brotli only for .br output;
+each step is skipped with a note when its tool is missing.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+import urllib.request
+
+from flask import Blueprint, url_for, request, send_from_directory, abort
+from markupsafe import Markup
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+FONT_FAMILIES = {
+    'Poppins': [400, 500, 600, 700],
+    'Nunito': [400, 600, 700],
+    'Inter': [400, 500, 600],
+}
+
+GOOGLE_FONTS_URL = (
+    'https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700'
+    '&family=Nunito:wght@400;600;700&family=Inter:wght@400;500;600&display=swap'
+)
+
+# Basic Latin + Latin-1, plus the dashes, quotes, bullets, arrows and check
+# marks the copy uses. Emoji always come from the system emoji font.
+SUBSET_UNICODES = 'U+0000-00FF,U+2013-2014,U+2018-201D,U+2022,U+2026,U+2190-2193,U+2713,U+2715'
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json')
+FAR_FUTURE = 'public, max-age=31536000, immutable'
+
+_manifest = None
+_inline_cache = {}
+
+
+# ======================
+# RUNTIME HELPERS
+# ======================
+
+def load_manifest():
+    """Read static/dist/manifest.json once per process ({} before the first build)."""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH, encoding='utf-8') as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def manifest_version():
+    """Short hash of the manifest, mixed into page ETags so new fingerprints invalidate them."""
+    return load_manifest().get('version', 'dev')
+
+
+def asset_url(name):
+    """URL of the fingerprinted build of a static file, or the plain file if unbuilt."""
+    built = load_manifest().get('files', {}).get(name)
+    if built:
+        return url_for('assets.dist', filename=built)
+    return url_for('static', filename=name)
+
+
+def has_asset(name):
+    return name in load_manifest().get('files', {})
+
+
+def inline_css(name):
+    """
+    Contents of a static stylesheet for a <style> tag (critical CSS).
+    Read once per process; the source file is used, since a fingerprint
+    would buy nothing for inlined bytes.
+    """
+    css = _inline_cache.get(name)
+    if css is None:
+        with open(os.path.join(STATIC_DIR, name), encoding='utf-8') as f:
+            css = f.read()
+        _inline_cache[name] = css
+    return Markup(css)
+
+
+def serve_dist(filename):
+    """
+    Serve a built asset, preferring a precompressed sibling the client accepts.
+    Everything under dist/ is content-addressed, so it is cached for a year.
+    """
+    full_path = os.path.join(DIST_DIR, filename)
+    if not os.path.isfile(full_path):
+        abort(404)
+
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(full_path + suffix):
+            response = send_from_directory(DIST_DIR, filename + suffix)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename)
+
+    response.headers['Cache-Control'] = FAR_FUTURE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """Register the /static/dist route and the template helpers."""
+    blueprint = Blueprint('assets', __name__)
+    blueprint.add_url_rule('/static/dist/<path:filename>', 'dist', serve_dist)
+    app.register_blueprint(blueprint)
+
+    app.jinja_env.globals.update(
+        asset_url=asset_url,
+        has_asset=has_asset,
+        inline_css=inline_css,
+        google_fonts_url=GOOGLE_FONTS_URL,
+    )
+
+
+# ======================
+# BUILD STEP
+# ======================
+
+def fingerprint(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def _fingerprinted_name(relative_path, digest):
+    stem, ext = os.path.splitext(relative_path)
+    return f'{stem}.{digest}{ext}'
+
+
+def precompress(path):
+    """Write .gz (and .br if brotli is installed) next to path."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data, quality=11))
+
+
+def build_fonts(font_dir=None):
+    """
+    Vendor and subset the three font families into dist/fonts and write dist/fonts.css.
+    Sources: TTF/WOFF2 files in font_dir named like 'Poppins-600.ttf', otherwise
+    the files Google Fonts serves for GOOGLE_FONTS_URL. Returns False if skipped.
+    """
+    try:
+        from fontTools import subset
+    except ImportError:
+        print("⚠ fontTools not installed - skipping font vendoring (pip install fonttools brotli)")
+        return False
+
+    if font_dir:
+        return _build_fonts(subset, _local_font_sources(font_dir))
+    # Downloaded sources only need to outlive the subsetting
+    with tempfile.TemporaryDirectory(prefix='nurtura-fonts-') as download_dir:
+        return _build_fonts(subset, _download_font_sources(download_dir))
+
+
+def _build_fonts(subset, sources):
+    if not sources:
+        print("⚠ No font sources found - skipping font vendoring")
+        return False
+
+    fonts_out = os.path.join(DIST_DIR, 'fonts')
+    os.makedirs(fonts_out, exist_ok=True)
+
+    faces = []
+    for (family, weight), source_path in sorted(sources.items()):
+        out_path = os.path.join(fonts_out, f'{family}-{weight}.woff2')
+        options = subset.Options()
+        options.flavor = 'woff2'
+        options.layout_features = ['kern', 'liga']
+        font = subset.load_font(source_path, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=subset.parse_unicodes(SUBSET_UNICODES))
+        subsetter.subset(font)
+        subset.save_font(font, out_path, options)
+
+        digest = fingerprint(out_path)
+        final_name = _fingerprinted_name(f'fonts/{family}-{weight}.woff2', digest)
+        os.replace(out_path, os.path.join(DIST_DIR, final_name))
+        faces.append(
+            "@font-face {\n"
+            f"  font-family: '{family}';\n"
+            "  font-style: normal;\n"
+            f"  font-weight: {weight};\n"
+            "  font-display: swap;\n"
+            f"  src: url('{os.path.basename(final_name)}') format('woff2');\n"
+            f"  unicode-range: {SUBSET_UNICODES};\n"
+            "}\n"
+        )
+        print(f"✓ Subset {family} {weight} → {final_name}")
+
+    # fonts.css lives next to the font files so the relative url()s resolve
+    with open(os.path.join(fonts_out, 'fonts.css'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(faces))
+    return True
+
+
+def _local_font_sources(font_dir):
+    sources = {}
+    for filename in os.listdir(font_dir):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() not in ('.ttf', '.otf', '.woff2') or '-' not in stem:
+            continue
+        family, weight = stem.rsplit('-', 1)
+        if family in FONT_FAMILIES and weight.isdigit() and int(weight) in FONT_FAMILIES[family]:
+            sources[(family, int(weight))] = os.path.join(font_dir, filename)
+    return sources
+
+
+def _download_font_sources(download_dir):
+    """Fetch the WOFF2 files Google Fonts serves to a modern browser (latin subset) into download_dir."""
+    import re
+
+    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/120 Safari/537.36'}
+    try:
+        req = urllib.request.Request(GOOGLE_FONTS_URL, headers=headers)
+        css = urllib.request.urlopen(req, timeout=15).read().decode('utf-8')
+    except OSError as e:
+        print(f"⚠ Could not download Google Fonts CSS: {e}")
+        return {}
+
+    def field(pattern, body, name):
+        match = re.search(pattern, body)
+        if match is None:
+            raise ValueError(f"Unexpected @font-face in {GOOGLE_FONTS_URL}: no {name} in {body.strip()!r}")
+        return match.group(1)
+
+    sources = {}
+    # Each block is preceded by a /* subset */ comment; keep only 'latin'
+    for block in re.finditer(r'/\* latin \*/\s*@font-face\s*{([^}]*)}', css):
+        body = block.group(1)
+        family = field(r"font-family:\s*'([^']+)'", body, 'font-family')
+        weight = int(field(r'font-weight:\s*(\d+)', body, 'font-weight'))
+        url = field(r'url\((https://[^)]+)\)', body, 'font URL')
+        path = os.path.join(download_dir, f'{family}-{weight}.woff2')
+        urllib.request.urlretrieve(url, path)
+        sources[(family, weight)] = path
+    return sources
+
+
+def build_css(manifest):
+    """Fingerprint every stylesheet under static/ (and the vendored fonts.css)."""
+    candidates = [name for name in sorted(os.listdir(STATIC_DIR)) if name.endswith('.css')]
+    for name in candidates:
+        _copy_fingerprinted(os.path.join(STATIC_DIR, name), name, manifest)
+
+    css_dir = os.path.join(STATIC_DIR, 'css')
+    if os.path.isdir(css_dir):
+        for name in sorted(os.listdir(css_dir)):
+            if name.endswith('.css'):
+                _copy_fingerprinted(os.path.join(css_dir, name), f'css/{name}', manifest)
+
+    fonts_css = os.path.join(DIST_DIR, 'fonts', 'fonts.css')
+    if os.path.isfile(fonts_css):
+        digest = fingerprint(fonts_css)
+        final_name = _fingerprinted_name('fonts/fonts.css', digest)
+        os.replace(fonts_css, os.path.join(DIST_DIR, final_name))
+        precompress(os.path.join(DIST_DIR, final_name))
+        manifest['files']['fonts.css'] = final_name
+
+
+def _copy_fingerprinted(source_path, logical_name, manifest):
+    final_name = _fingerprinted_name(logical_name, fingerprint(source_path))
+    out_path = os.path.join(DIST_DIR, final_name)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    shutil.copyfile(source_path, out_path)
+    if out_path.endswith(COMPRESSIBLE_EXTENSIONS):
+        precompress(out_path)
+    manifest['files'][logical_name] = final_name
+    print(f"✓ {logical_name} → {final_name}")
+
+
+def build(font_dir=None):
+    """Rebuild static/dist from scratch and write the manifest."""
+    global _manifest
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {'files': {}}
+    build_fonts(font_dir)
+    build_css(manifest)
+
+    manifest['version'] = hashlib.sha256(
+        json.dumps(manifest, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:10]
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _manifest = manifest
+    print(f"✓ Wrote {MANIFEST_PATH} (version {manifest['version']})")
+    return manifest
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if not args or args[0] != 'build':
+        print("Usage: python assets.py build [--font-dir DIR]")
+        sys.exit(1)
+    font_dir = args[args.index('--font-dir') + 1] if '--font-dir' in args else None
+    build(font_dir)
@@ -0,0 +1,139 @@
+"""
+Sync gunicorn versus the async serving mode (asgi.py) on the Claude-bound routes.
+
+Both servers run against the LLM stub (llm_stub.py), with the same
+database, worker count and client load. Each of --users virtual parents
+repeatedly onboards a new baby. That means POST /api/generate-content,
+which waits on Claude for areas, then GET /home, then GET /activities/<id>
+for every area, each of which waits on Claude for activities. So nearly every
+request waits on the model.
+
+    python benchmarks/async_serving.py [--users 100] [--duration 20] [--workers 1] [--threads 4]
+                                       [--llm-latency-ms 1000] [--llm-ms-per-token 0]
+                                       [--modes sync,async] [--json results.json]
+
+sync  is `gunicorn -w WORKERS --threads THREADS app:app`, the current deployment.
+async is `gunicorn -k uvicorn.workers.UvicornWorker -w WORKERS asgi:app`, which needs uvicorn.
+
+Expect the sync server to have only WORKERS x THREADS generations in flight
+at once, while the async one has as many as there are users.
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import llm_stub
+from load_test import Parent, Stats, arg, prepare_database, start_app, summarize
+
+LLM_ROUTES = ('POST /api/generate-content', 'GET /activities/<id>')
+
+
+def server_command(mode, workers, threads):
+    def command(port):
+        bind = ['-b', f'127.0.0.1:{port}', '-w', str(workers)]
+        if mode == 'sync':
+            return ['gunicorn', *bind, '--threads', str(threads), 'app:app']
+        return ['gunicorn', *bind, '-k', 'uvicorn.workers.UvicornWorker', 'asgi:app']
+    return command
+
+
+def journey(port, stats, run_id, n):
+    """One new parent: onboard (areas from Claude), then open every area (activities from Claude)."""
+    parent = Parent(port, stats, f'async-{run_id}-{n}@example.test')
+    parent.onboard()
+    status, page = parent.request('GET', '/home', 'GET /home')
+    for area_id in re.findall(rb'viewActivities\((\d+)\)', page or b''):
+        parent.request('GET', f'/activities/{int(area_id)}', 'GET /activities/<id>')
+    parent.conn.close()
+
+
+def run_mode(mode, env, users, duration, workers, threads):
+    process, port = start_app(env, workers, command=server_command(mode, workers, threads))
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:8]
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def user():
+        while time.time() < stop_at:
+            with lock:
+                n = next(counter)
+            journey(port, stats, run_id, n)
+
+    started = time.time()
+    threads_ = [threading.Thread(target=user) for _ in range(users)]
+    try:
+        for thread in threads_:
+            thread.start()
+        for thread in threads_:
+            thread.join()
+    finally:
+        elapsed = time.time() - started
+        process.terminate()
+        process.wait()
+
+    result = {'elapsed_s': round(elapsed, 1), 'routes': {}}
+    for route in sorted(set(stats.latencies) | set(stats.errors)):
+        latencies = stats.latencies.get(route, [])
+        row = {'count': len(latencies), 'per_sec': round(len(latencies) / elapsed, 1),
+               'errors': stats.errors.get(route, 0)}
+        row.update(summarize(latencies) if latencies else {})
+        result['routes'][route] = row
+    result['llm_requests_per_sec'] = round(
+        sum(result['routes'].get(route, {}).get('count', 0) for route in LLM_ROUTES) / elapsed, 1)
+    return result
+
+
+def main():
+    users = arg('--users', 100, int)
+    duration = arg('--duration', 20, float)
+    workers = arg('--workers', 1, int)
+    threads = arg('--threads', 4, int)
+    modes = arg('--modes', 'sync,async').split(',')
+
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        if 'async' in modes:
+            print("⚠ uvicorn is not installed; skipping the async mode (pip install uvicorn)")
+            modes = [mode for mode in modes if mode != 'async']
+
+    stub, stub_url = llm_stub.start(latency_ms=arg('--llm-latency-ms', 1000, float),
+                                    ms_per_token=arg('--llm-ms-per-token', 0.0, float))
+    results = {'users': users, 'duration_s': duration, 'workers': workers, 'threads': threads, 'modes': {}}
+    try:
+        for mode in modes:
+            # A fresh database per mode, so both start from the same empty state.
+            database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='nurtura-async-'), 'bench.db')
+            prepare_database(database_url, 0)
+            env = dict(os.environ,
+                       NURTURA_DATABASE_URL=database_url,
+                       AI_INTEGRATIONS_ANTHROPIC_BASE_URL=stub_url,
+                       AI_INTEGRATIONS_ANTHROPIC_API_KEY='stub',
+                       SESSION_SECRET=os.environ.get('SESSION_SECRET', 'async-bench'))
+            print(f"⟳ {mode}: {users} users for {duration:.0f} s on {workers} worker(s)")
+            results['modes'][mode] = run_mode(mode, env, users, duration, workers, threads)
+    finally:
+        stub.shutdown()
+
+    print(f"\n{'mode':<8}{'route':<30}{'count':>7}{'req/s':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'errors':>8}   (ms)")
+    for mode, result in results['modes'].items():
+        for route, row in result['routes'].items():
+            print(f"{mode:<8}{route:<30}{row['count']:>7}{row['per_sec']:>8.1f}"
+                  + ''.join(f"{row.get(key, 0):>9.1f}" for key in ('p50', 'p90', 'p99'))
+                  + f"{row['errors']:>8}")
+        print(f"{mode:<8}{'Claude-bound requests/s':<30}{result['llm_requests_per_sec']:>15.1f}\n")
+
+    if '--json' in sys.argv:
+        with open(arg('--json', None), 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
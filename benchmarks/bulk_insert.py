@@ -0,0 +1,82 @@
+"""
+Bulk insert benchmark: a 365-day challenge, saved row by row and in bulk.
+
+Compares the old path, one save_challenge_activity() per day with a
+connection and a commit each, against save_challenge_activities(), which
+uses one executemany in one transaction. Each backend gets a fresh database.
+
+    python benchmarks/bulk_insert.py [--days N] [--repeat N] [--backend NAME=URL ...] [--json results.json]
+"""
+import json
+import statistics
+import sys
+import time
+
+from common import make_app, fake_challenge_daily_activities
+from backends import default_backends, extra_backends
+
+import database
+
+
+def day_rows(days):
+    return [
+        {
+            'day_number': activity['day_number'],
+            'activity_title': activity['title'],
+            'activity_description': activity['description'],
+            'materials': json.dumps(activity['materials']),
+            'how_to': json.dumps(activity['how_to']),
+            'why_it_helps': activity['why_it_helps'],
+            'duration_min': activity['duration_min'],
+        }
+        for activity in fake_challenge_daily_activities(days, 'Bench', 9, num_days=days)
+    ]
+
+
+def insert_one_by_one(challenge_id, rows):
+    for row in rows:
+        database.save_challenge_activity(
+            challenge_id, row['day_number'], row['activity_title'], row['activity_description'],
+            row['materials'], row['how_to'], row['why_it_helps'], row['duration_min']
+        )
+
+
+def insert_bulk(challenge_id, rows):
+    database.save_challenge_activities(challenge_id, rows)
+
+
+def time_backend(database_url, rows, repeat):
+    app = make_app(database_url)
+    results = {}
+    with app.app_context():
+        for name, insert in (('one_by_one', insert_one_by_one), ('bulk', insert_bulk)):
+            timings = []
+            for _ in range(repeat):
+                challenge_id = database.save_challenge(len(rows), 'Bench', 'Bench', 'Bench', '🎯', [])
+                started = time.perf_counter()
+                insert(challenge_id, rows)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert len(database.get_challenge_activities(challenge_id)) == len(rows)
+            results[name] = round(statistics.median(timings), 2)
+    return results
+
+
+def main():
+    days = int(sys.argv[sys.argv.index('--days') + 1]) if '--days' in sys.argv else 365
+    repeat = int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 5
+    rows = day_rows(days)
+    backends = dict(default_backends(), **extra_backends())
+
+    results = {name: time_backend(url, rows, repeat) for name, url in backends.items()}
+
+    print(f"{'backend':<16}{'one by one':>12}{'bulk':>10}{'speedup':>10}   (ms for {days} days, median of {repeat})")
+    for name, r in results.items():
+        print(f"{name:<16}{r['one_by_one']:>12.2f}{r['bulk']:>10.2f}{r['one_by_one'] / r['bulk']:>9.1f}x")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Shared setup for the benchmark scripts.
+
+Builds the real Flask app against a throwaway database, with the Claude
+calls in ai_service replaced by canned content of realistic size, and walks a
+parent through onboarding so every route has data to render.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database
+import ai_service
+
+AREA_TYPES = ['Physical', 'Cognitive', 'Linguistic', 'Social-Emotional']
+
+
+def fake_development_areas(baby_name, age_months, development_goals):
+    return [
+        {
+            'name': f'{area_type} Adventure Time {i + 1}',
+            'type': area_type,
+            'age_min': 6,
+            'age_max': 12,
+            'emoji': '🎯',
+            'color': '#D6E8F7',
+            'description': 'Playful moments that help your little one explore, giggle and grow '
+                           'a little more confident every single day together.',
+            'activity_count': 4,
+        }
+        for i, area_type in enumerate(AREA_TYPES * 2)
+    ]
+
+
+def fake_activities_for_area(area_name, area_description, development_type, age_range_min, age_range_max):
+    return [
+        {
+            'title': f'Giggle Game {i + 1}',
+            'short_description': 'A gentle, joyful game to share with your baby on a cosy blanket.',
+            'icon': '🎵',
+            'materials': ['Soft blanket', 'Favourite toy', 'Your voice'],
+            'how_to': [f'Step {step}: Smile, narrate and follow your baby\'s lead.' for step in range(1, 6)],
+            'why_it_helps': 'Builds language, trust and body awareness through warm back-and-forth play. ' * 2,
+            'duration_min': 8,
+            'safety_notes': 'Always supervise and stop if your baby seems tired.',
+            'reflection_prompt': 'What made your baby light up today?',
+        }
+        for i in range(4)
+    ]
+
+
+def fake_challenge_templates():
+    return [
+        {
+            'duration': days,
+            'title': f'{days}-Day Connection Quest',
+            'tagline': 'Build Curiosity & Wonder',
+            'description': 'A daily ritual of small, joyful moments that add up to a deep bond. ' * 3,
+            'emoji': '🌟',
+            'development_types': AREA_TYPES,
+        }
+        for days in (30, 90, 180, 365)
+    ]
+
+
+def fake_challenge_daily_activities(challenge_duration, challenge_title, baby_age_months, num_days=10):
+    return [
+        {
+            'day_number': day,
+            'title': f'Day {day}: Morning Cuddle & Song',
+            'description': 'Start the day with gentle cuddles and a favourite song.',
+            'materials': ['Your voice', 'Comfortable spot'],
+            'how_to': ['Sit comfortably with baby', 'Sing slowly', 'Make eye contact'],
+            'why_it_helps': 'Builds emotional security and early language.',
+            'duration_min': 10,
+        }
+        for day in range(1, num_days + 1)
+    ]
+
+
+def fake_daily_activities(age_label, age_months, development_goals, count=3):
+    return [
+        {
+            'title': f'Peekaboo Surprise {i + 1}',
+            'short_teaser': 'Hide, pause, reveal - and watch the giggles!',
+            'what_you_need': 'A light scarf or blanket',
+            'full_instructions': 'Sit face to face. Cover your face, pause, then reveal it with a smile. ' * 2,
+            'why_it_matters': 'Builds object permanence and shared joy.',
+            'tips': 'Keep the pauses short at first.',
+            'duration': '10-15 min',
+            'goal_focus': (development_goals or AREA_TYPES)[i % len(development_goals or AREA_TYPES)],
+            'domain': 'Cognitive',
+        }
+        for i in range(count)
+    ]
+
+
+def install_fake_ai():
+    """Replace the Claude-backed generators with the canned versions above."""
+    ai_service.generate_development_areas = fake_development_areas
+    ai_service.generate_activities_for_area = fake_activities_for_area
+    ai_service.generate_challenge_templates = fake_challenge_templates
+    ai_service.generate_challenge_daily_activities = fake_challenge_daily_activities
+    ai_service.generate_daily_activities = fake_daily_activities
+
+
+def make_app(database_url=None, config=None):
+    """
+    Build an app against a throwaway database (a fresh SQLite file by default).
+    `config` overrides app settings.
+    """
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='nurtura-bench-'), 'bench.db')
+    install_fake_ai()
+
+    import app as app_module
+    return app_module.create_app(dict({'DATABASE_URL': database_url, 'AUTO_MIGRATE': True}, **(config or {})))
+
+
+def onboard(client, contact='bench@example.com'):
+    """Run the onboarding flow and return ids of the content it generated."""
+    client.post('/parent-entry', data={'contact_info': contact})
+    client.post('/create-profile', data={'baby_name': 'Mia', 'age_group': '6–12 Months'})
+    client.post('/select-goals', data={'development_goals': AREA_TYPES})
+    client.post('/api/generate-content')
+
+    with client.application.app_context():
+        baby = database.get_baby_by_uuid(_session_value(client, 'baby_uuid'))
+        area = database.get_development_areas(baby['id'])[0]
+        client.get(f"/activities/{area['id']}")
+        activity = database.get_area_activities(area['id'])[0]
+        challenge = database.get_all_challenges()[0]
+        client.get(f"/challenge/{challenge['id']}")
+    return {
+        'baby_id': baby['id'],
+        'area_id': area['id'],
+        'activity_id': activity['id'],
+        'challenge_id': challenge['id'],
+    }
+
+
+def route_suite(ids):
+    """The mobile-facing GET routes, with ids filled in."""
+    return {
+        'parent_entry': '/',
+        'home': '/home',
+        'tasks_list': f"/activities/{ids['area_id']}",
+        'task_detail': f"/activity/{ids['activity_id']}",
+        'timer': f"/timer/{ids['activity_id']}",
+        'challenge': f"/challenge/{ids['challenge_id']}",
+        'create_profile': '/create-profile',
+        'coming_soon': '/coming-soon',
+    }
+
+
+def _session_value(client, key):
+    with client.session_transaction() as session:
+        return session.get(key)
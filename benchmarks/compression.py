@@ -0,0 +1,86 @@
+"""
+Response compression benchmark per route.
+
+For each page, requests it with Accept-Encoding identity, gzip and br and
+reports the payload size and the server time to the full response (the TTFB
+on a fast network). The compressed-bytes cache is toggled off for a
+'cold' column, which shows what the compressor costs when nothing is cached.
+A modelled mobile transfer time (RTT + bytes over a slow 4G link) shows what
+the smaller payload buys on a phone.
+
+    python benchmarks/compression.py [--repeat N] [--json results.json]
+"""
+import json
+import statistics
+import sys
+import time
+
+from common import make_app, onboard, route_suite
+
+import compression
+
+ENCODINGS = ['identity', 'gzip', 'br']
+MOBILE_RTT_MS = 150
+MOBILE_KBPS = 1600
+
+
+def median_ms(client, path, encoding, repeat):
+    timings = []
+    response = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, headers={'Accept-Encoding': encoding})
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), response
+
+
+def mobile_ms(size):
+    return MOBILE_RTT_MS + size * 8 / MOBILE_KBPS
+
+
+def measure(app, client, path, repeat):
+    result = {'path': path}
+    for encoding in ENCODINGS:
+        app.config['COMPRESS_CACHE_BYTES'] = compression.DEFAULT_CONFIG['COMPRESS_CACHE_BYTES']
+        warm_ms, response = median_ms(client, path, encoding, repeat)
+        app.config['COMPRESS_CACHE_BYTES'] = 0
+        compression.clear_cache()
+        cold_ms, _ = median_ms(client, path, encoding, repeat)
+        result[encoding] = {
+            'status': response.status_code,
+            'content_encoding': response.headers.get('Content-Encoding'),
+            'bytes': len(response.data),
+            'server_ms': round(warm_ms, 3),
+            'server_ms_uncached': round(cold_ms, 3),
+            'mobile_ms': round(mobile_ms(len(response.data)), 1),
+        }
+    app.config['COMPRESS_CACHE_BYTES'] = compression.DEFAULT_CONFIG['COMPRESS_CACHE_BYTES']
+    return result
+
+
+def main():
+    repeat = int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 50
+    if compression.brotli is None:
+        print("⚠ brotli not installed; 'br' requests fall back to gzip")
+
+    app = make_app()
+    client = app.test_client()
+    ids = onboard(client)
+
+    results = {name: measure(app, client, path, repeat) for name, path in route_suite(ids).items()}
+
+    print(f"{'route':<16}{'encoding':<10}{'bytes':>8}{'server ms':>11}{'uncached':>10}{'mobile ms':>11}")
+    for name, r in results.items():
+        for encoding in ENCODINGS:
+            e = r[encoding]
+            print(f"{name:<16}{encoding:<10}{e['bytes']:>8}{e['server_ms']:>11.2f}"
+                  f"{e['server_ms_uncached']:>10.2f}{e['mobile_ms']:>11.1f}")
+    print(f"cache: {compression.cache_stats()}")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
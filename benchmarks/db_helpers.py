@@ -0,0 +1,153 @@
+"""
+database.py helper benchmark at production-like scale, with regression checks.
+
+Fills a fresh database with synthetic_data.generate(), then times each
+helper the routes depend on over --iterations calls with randomly chosen
+(but seeded) keys. --scale 1 is about 100k parents, 150k babies, 1M
+area_activities and 10M task_completions. The default of 0.01 runs in well
+under a minute.
+
+    python benchmarks/db_helpers.py [--scale F] [--iterations N] [--database URL]
+                                    [--seed N] [--json results.json] [--compare baseline.json] [--threshold 0.2]
+
+--json saves the medians together with the commit they were measured on.
+--compare reads an earlier --json file, prints the change per helper and
+exits 1 if any median is more than --threshold (20% by default) slower.
+Compare runs of the same scale on the same machine only.
+"""
+import contextlib
+import io
+import json
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from common import ROOT, make_app
+
+import database
+import synthetic_data
+
+
+
+def arg(name, default, cast=str):
+    return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+
+def cases(data, rng):
+    """Helper name -> zero-argument call with freshly sampled keys."""
+    since = (datetime.now(timezone.utc).date() - timedelta(days=6)).isoformat()
+
+    active_babies = list(data['activities_by_baby'])
+
+    def completion():
+        baby_id = rng.choice(active_babies)
+        activity_id = rng.choice(data['activities_by_baby'][baby_id])
+        database.mark_task_complete(baby_id, activity_id, data['area_of_activity'][activity_id], uuid.uuid4().hex)
+
+    return {
+        'get_baby_by_uuid': lambda: database.get_baby_by_uuid(rng.choice(data['baby_uuids'])),
+        'get_development_areas': lambda: database.get_development_areas(rng.choice(data['baby_ids'])),
+        'get_home_content_version': lambda: database.get_home_content_version(rng.choice(data['baby_ids'])),
+        'get_area_activities': lambda: database.get_area_activities(rng.choice(data['area_ids'])),
+        'get_completed_task_ids_today': lambda: database.get_completed_task_ids_today(rng.choice(data['baby_ids'])),
+        'get_completed_tasks_count_today': lambda: database.get_completed_tasks_count_today(rng.choice(data['baby_ids'])),
+        'get_daily_progress': lambda: database.get_daily_progress(rng.choice(data['baby_ids']), since),
+        'get_active_challenges_for_baby': lambda: database.get_active_challenges_for_baby(rng.choice(data['baby_ids'])),
+        'enroll_in_challenge': lambda: database.enroll_in_challenge(rng.choice(data['baby_ids']), rng.choice(data['challenge_ids'])),
+        'mark_task_complete': completion,
+    }
+
+
+def measure(call, iterations):
+    for _ in range(max(iterations // 10, 1)):
+        call()  # warm the page cache and statement cache first
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return {
+        'median_us': round(statistics.median(timings), 1),
+        'p95_us': round(timings[max(int(len(timings) * 0.95) - 1, 0)], 1),
+        'mean_us': round(statistics.fmean(timings), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} (commit {baseline['meta'].get('commit')}, "
+          f"scale {baseline['meta'].get('scale')}):")
+    regressions = []
+    for name, r in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"  {name:<34}{'new':>10}")
+            continue
+        change = r['median_us'] / before['median_us'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"  {name:<34}{change:>+10.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    scale = arg('--scale', 0.01, float)
+    iterations = arg('--iterations', 200, int)
+    threshold = arg('--threshold', 0.2, float)
+    seed = arg('--seed', 42, int)
+    rng = random.Random(seed)
+
+    app = make_app(arg('--database', None))
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        data = synthetic_data.generate(scale=scale, seed=seed)
+        seed_seconds = time.perf_counter() - started
+        results = {name: measure(call, iterations) for name, call in cases(data, rng).items()}
+
+    print(f"Seeded {', '.join(f'{count:,} {table}' for table, count in data['counts'].items())} "
+          f"in {seed_seconds:.1f} s")
+    print(f"{'helper':<34}{'median µs':>12}{'p95 µs':>12}{'mean µs':>12}   ({iterations} calls each)")
+    for name, r in results.items():
+        print(f"{name:<34}{r['median_us']:>12.1f}{r['p95_us']:>12.1f}{r['mean_us']:>12.1f}")
+
+    if '--json' in sys.argv:
+        with open(arg('--json', None), 'w') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'scale': scale,
+                    'iterations': iterations,
+                    'counts': data['counts'],
+                    'backend': arg('--database', 'sqlite-file'),
+                    'sqlite_version': sqlite3.sqlite_version,
+                    'python': sys.version.split()[0],
+                    'measured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                },
+                'results': results,
+            }, f, indent=2)
+
+    if '--compare' in sys.argv:
+        regressions = compare(results, arg('--compare', None), threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} helper(s) slower than the baseline by more than {threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+First-request latency of a fresh worker, with and without warm-up.
+
+Prepares one onboarded database. Then, for every route, starts fresh
+interpreters that import the app the way a gunicorn worker does. Half of
+them call app.warm_up() first, as the post_worker_init hook does. Each one
+times its first request and then a second request to the same route, which
+is the steady-state reference. The Claude connection is not opened (there is
+no network here), so the numbers cover templates, SQLite and the caches.
+
+    python benchmarks/first_request.py [--runs N] [--json results.json]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import make_app, onboard, route_suite, _session_value
+
+MODES = ['cold', 'warm']
+
+
+def child(database_url, mode, path, session_values):
+    """Runs in the fresh interpreter: time the worker's first two requests."""
+    app = make_app(database_url)
+    import app as app_module
+
+    warm_up_ms = 0.0
+    if mode == 'warm':
+        started = time.perf_counter()
+        app_module.warm_up(app, connect_llm=False)
+        warm_up_ms = (time.perf_counter() - started) * 1000
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(session_values)
+
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'warm_up_ms': warm_up_ms, 'first_ms': timings[0], 'second_ms': timings[1]}
+
+
+def run_child(database_url, mode, path, session_values):
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', json.dumps([database_url, mode, path, session_values])],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else 3
+
+    database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='nurtura-first-'), 'bench.db')
+    client = make_app(database_url).test_client()
+    ids = onboard(client)
+    session_values = {key: _session_value(client, key) for key in ('parent_id', 'baby_uuid')}
+
+    results = {}
+    for name, path in route_suite(ids).items():
+        results[name] = {}
+        for mode in MODES:
+            samples = [run_child(database_url, mode, path, session_values) for _ in range(runs)]
+            results[name][mode] = {
+                key: round(statistics.median(sample[key] for sample in samples), 2)
+                for key in ('warm_up_ms', 'first_ms', 'second_ms')
+            }
+
+    print(f"{'route':<16}{'cold first':>12}{'warm first':>12}{'steady':>10}{'warm-up':>10}   (ms, median of {runs})")
+    for name, r in results.items():
+        print(f"{name:<16}{r['cold']['first_ms']:>12.2f}{r['warm']['first_ms']:>12.2f}"
+              f"{r['warm']['second_ms']:>10.2f}{r['warm']['warm_up_ms']:>10.1f}")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        database_url, mode, path, session_values = json.loads(sys.argv[sys.argv.index('--child') + 1])
+        print(json.dumps(child(database_url, mode, path, session_values)))
+    else:
+        main()
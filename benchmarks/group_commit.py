@@ -0,0 +1,104 @@
+"""
+Group commit benchmark: sustained task completions per second.
+
+Several parents tap "done" at the same moment: --threads clients POST to
+/api/mark-task-complete for --seconds each. This runs twice on a fresh
+SQLite file, once with COMPLETION_BATCHING off (one INSERT and commit per
+tap) and once with the completion_buffer group commit on. Every tap sends
+its own Idempotency-Key, as separate timer runs do. For each mode it
+reports throughput, request latency, failed requests (e.g. "database is
+locked") and the average number of rows per commit.
+
+    python benchmarks/group_commit.py [--threads N] [--seconds S] [--window-ms MS] [--json results.json]
+"""
+import contextlib
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+from common import make_app, onboard
+
+import database
+
+
+def client_for(app, session_values):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(session_values)
+    return client
+
+
+def hammer(client, path, stop_at, latencies, failures):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = client.post(path, headers={'Idempotency-Key': uuid.uuid4().hex})
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            failures.append(response.status_code)
+
+
+def run(batching, threads, seconds, window_ms):
+    app = make_app(config={'COMPLETION_BATCHING': batching, 'COMPLETION_BATCH_WINDOW_MS': window_ms})
+    setup = app.test_client()
+    ids = onboard(setup)
+    with setup.session_transaction() as session:
+        session_values = dict(session)
+    path = f"/api/mark-task-complete/{ids['activity_id']}"
+
+    latencies, failures = [], []
+    clients = [client_for(app, session_values) for _ in range(threads)]
+    stop_at = time.perf_counter() + seconds
+    workers = [threading.Thread(target=hammer, args=(client, path, stop_at, latencies, failures))
+               for client in clients]
+    # The per-tap path prints a line per completion; keep it out of the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        stored = database.get_completed_tasks_count_today(ids['baby_id'])
+    assert stored == len(latencies), f'{stored} rows stored for {len(latencies)} acknowledged taps'
+
+    buffer = app.extensions.get('completion_buffer')
+    latencies.sort()
+    return {
+        'completions_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        'failed': len(failures),
+        'rows_per_commit': round(buffer.stats['rows'] / buffer.stats['batches'], 1) if buffer else 1.0,
+    }
+
+
+def main():
+    threads = int(sys.argv[sys.argv.index('--threads') + 1]) if '--threads' in sys.argv else 16
+    seconds = float(sys.argv[sys.argv.index('--seconds') + 1]) if '--seconds' in sys.argv else 3
+    window_ms = float(sys.argv[sys.argv.index('--window-ms') + 1]) if '--window-ms' in sys.argv else 2
+
+    results = {
+        'per_tap_commit': run(False, threads, seconds, window_ms),
+        'group_commit': run(True, threads, seconds, window_ms),
+    }
+
+    print(f"{'mode':<16}{'per sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}{'rows/commit':>13}"
+          f"   ({threads} threads, {seconds:g} s, {window_ms:g} ms window)")
+    for name, r in results.items():
+        print(f"{name:<16}{r['completions_per_sec']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['failed']:>8}{r['rows_per_commit']:>13.1f}")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
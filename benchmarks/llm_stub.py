@@ -0,0 +1,275 @@
+"""
+Local stand-in for the Anthropic Messages API, for offline load tests.
+
+Answers POST /v1/messages with the canned content from common.py, in the
+JSON shape each ai_service prompt asks for. It waits --latency-ms plus
+--ms-per-token for every output token first, roughly like a real model.
+GET /v1/models answers warm_connection(). --error-rate answers that share
+of requests with 529 overloaded_error.
+
+It also mimics the Message Batches API (ai_service.run_batch()): create,
+retrieve, results (JSONL) and cancel under /v1/messages/batches. A batch
+ends --batch-seconds after it was created. By then every request has its
+answer, and --error-rate of them have errored with overloaded_error.
+
+    python benchmarks/llm_stub.py [--port 8765] [--latency-ms 300] [--ms-per-token 1] [--error-rate 0]
+                                  [--batch-seconds 2]
+
+Point the app at it with
+AI_INTEGRATIONS_ANTHROPIC_BASE_URL=http://127.0.0.1:8765 (any API key works).
+From code, start() runs it on a background thread and returns the URL.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import (fake_development_areas, fake_activities_for_area, fake_challenge_templates,
+                    fake_challenge_daily_activities, fake_daily_activities, AREA_TYPES)
+
+MODEL = 'claude-sonnet-4-5'
+
+
+def fake_questions():
+    return [
+        {'domain': domain, 'text': f'Can your baby {verb}?', 'age_range': '6 months',
+         'helpful_hint': 'Watch during play.'}
+        for domain, verb in zip(AREA_TYPES, ('roll over', 'find a hidden toy', 'babble back', 'smile at you'))
+    ]
+
+
+def fake_personalized_activities():
+    return [
+        {**activity, 'description': activity['short_description'], 'target_ability': 'Rolling',
+         'target_domain': 'Physical', 'ability_state': 'emerging'}
+        for activity in fake_activities_for_area('Stub', '', 'Physical', 6, 12)
+    ]
+
+
+def reply_for(prompt):
+    """The JSON document the prompt asks for, picked by its wording."""
+    if 'ability assessment questions' in prompt:
+        return {'questions': fake_questions()}
+    if 'creating personalized activities' in prompt:
+        return {'activities': fake_personalized_activities()}
+    if 'development areas for a' in prompt:
+        return {'areas': fake_development_areas('Stub', 9, AREA_TYPES)}
+    if 'EXACTLY 4 fun activities' in prompt:
+        return {'activities': fake_activities_for_area('Stub', '', 'Physical', 6, 12)}
+    if 'bonding challenges for different durations' in prompt:
+        return {'challenges': fake_challenge_templates()}
+    match = re.search(r'Generate (\d+) different parent-child activities of the day', prompt)
+    if match:
+        return {'activities': fake_daily_activities('Stub', 9, [], int(match.group(1)))}
+    match = re.search(r'Generate (\d+) daily parent-child bonding activities', prompt)
+    if match:
+        num_days = int(match.group(1))
+        return {'activities': fake_challenge_daily_activities(num_days, 'Stub', 9, num_days=num_days)}
+    return {'text': 'ok'}
+
+
+def message(body):
+    """A Messages API response for one request body."""
+    prompt = ' '.join(
+        part if isinstance(part, str) else part.get('text', '')
+        for turn in body.get('messages', [])
+        for part in ([turn['content']] if isinstance(turn['content'], str) else turn['content'])
+    )
+    text = json.dumps(reply_for(prompt))
+    return {
+        'id': f'msg_stub_{uuid.uuid4().hex[:24]}',
+        'type': 'message',
+        'role': 'assistant',
+        'model': body.get('model', MODEL),
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': 'end_turn',
+        'stop_sequence': None,
+        'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4},
+    }
+
+
+def timestamp(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+class Batch:
+    """One submitted message batch. Its answers are worked out up front."""
+
+    def __init__(self, requests, seconds, error_rate):
+        self.id = f'msgbatch_stub_{uuid.uuid4().hex[:24]}'
+        self.created_at = datetime.now(timezone.utc)
+        self.ends_at = self.created_at + timedelta(seconds=seconds)
+        self.canceled_at = None
+        self.results = []
+        for request in requests:
+            if random.random() < error_rate:
+                result = {'type': 'errored', 'error': {'type': 'error', 'error': {
+                    'type': 'overloaded_error', 'message': 'Overloaded (stub)'}}}
+            else:
+                result = {'type': 'succeeded', 'message': message(request['params'])}
+            self.results.append({'custom_id': request['custom_id'], 'result': result})
+
+    def ended(self):
+        return self.canceled_at is not None or datetime.now(timezone.utc) >= self.ends_at
+
+    def describe(self, base_url):
+        ended = self.ended()
+        counts = {'processing': 0, 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0}
+        if not ended:
+            counts['processing'] = len(self.results)
+        elif self.canceled_at is not None:
+            counts['canceled'] = len(self.results)
+        else:
+            for entry in self.results:
+                counts[entry['result']['type']] += 1
+        return {
+            'id': self.id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': counts,
+            'created_at': timestamp(self.created_at),
+            'expires_at': timestamp(self.created_at + timedelta(hours=24)),
+            'ended_at': timestamp(self.canceled_at or self.ends_at) if ended else None,
+            'cancel_initiated_at': timestamp(self.canceled_at) if self.canceled_at else None,
+            'archived_at': None,
+            'results_url': f'{base_url}/v1/messages/batches/{self.id}/results' if ended else None,
+        }
+
+    def result_lines(self):
+        for entry in self.results:
+            if self.canceled_at is not None:
+                entry = {'custom_id': entry['custom_id'], 'result': {'type': 'canceled'}}
+            yield json.dumps(entry)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency_ms = 300
+    ms_per_token = 1.0
+    error_rate = 0.0
+    batch_seconds = 2.0
+    batches = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('request-id', f'req_stub_{uuid.uuid4().hex[:16]}')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def overloaded(self):
+        if random.random() >= self.error_rate:
+            return False
+        time.sleep(self.latency_ms / 4000)
+        self.send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded (stub)'}},
+                       headers=[('retry-after', '1')])
+        return True
+
+    def not_found(self):
+        self.send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+
+    def batch_route(self):
+        """(batch or None, trailing action) for a /v1/messages/batches/<id>[/action] path."""
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) < 4:
+            return None, None
+        return self.batches.get(parts[3]), '/'.join(parts[4:])
+
+    def do_GET(self):
+        if self.path.startswith('/v1/messages/batches/'):
+            batch, action = self.batch_route()
+            if batch is None:
+                self.not_found()
+            elif action == '':
+                self.send_json(200, batch.describe(f"http://{self.headers['Host']}"))
+            elif action == 'results' and batch.ended():
+                data = ('\n'.join(batch.result_lines()) + '\n').encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-jsonl')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.not_found()
+        elif self.path.startswith('/v1/models'):
+            self.send_json(200, {'data': [{'type': 'model', 'id': MODEL, 'display_name': 'Stub',
+                                           'created_at': '2025-01-01T00:00:00Z'}],
+                                 'has_more': False, 'first_id': MODEL, 'last_id': MODEL})
+        else:
+            self.not_found()
+
+    def do_POST(self):
+        if self.path.startswith('/v1/messages/batches'):
+            self.post_batch()
+            return
+        if not self.path.startswith('/v1/messages'):
+            self.not_found()
+            return
+        body = self.read_json()
+        if self.overloaded():
+            return
+        reply = message(body)
+        time.sleep((self.latency_ms + self.ms_per_token * reply['usage']['output_tokens']) / 1000)
+        self.send_json(200, reply)
+
+    def post_batch(self):
+        body = self.read_json()
+        base_url = f"http://{self.headers['Host']}"
+        if self.path.split('?', 1)[0].rstrip('/') == '/v1/messages/batches':
+            batch = Batch(body.get('requests', []), self.batch_seconds, self.error_rate)
+            self.batches[batch.id] = batch
+            self.send_json(200, batch.describe(base_url))
+            return
+        batch, action = self.batch_route()
+        if batch is None or action != 'cancel':
+            self.not_found()
+            return
+        if not batch.ended():
+            batch.canceled_at = datetime.now(timezone.utc)
+        self.send_json(200, batch.describe(base_url))
+
+
+def start(port=0, latency_ms=300, ms_per_token=1.0, error_rate=0.0, batch_seconds=2.0):
+    """Serve on a daemon thread. Returns (server, base_url)."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'latency_ms': latency_ms, 'ms_per_token': ms_per_token, 'error_rate': error_rate,
+        'batch_seconds': batch_seconds, 'batches': {},
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='llm-stub', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    def arg(name, default, cast):
+        return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+    server, url = start(arg('--port', 8765, int), arg('--latency-ms', 300, float),
+                        arg('--ms-per-token', 1.0, float), arg('--error-rate', 0.0, float),
+                        arg('--batch-seconds', 2.0, float))
+    print(f"✓ LLM stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
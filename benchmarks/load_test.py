@@ -0,0 +1,327 @@
+"""
+End-to-end HTTP load test, fully offline.
+
+Starts the LLM stub (llm_stub.py), prepares a database, and serves the app
+from a separate process: the threaded Werkzeug server by default, or
+gunicorn with --gunicorn WORKERS. It then runs --users virtual parents,
+each on its own keep-alive connection. Each parent:
+
+    POST /parent-entry, /create-profile, /select-goals, /api/generate-content
+    then loops: GET /home -> /activities/<id> -> /activity/<id> -> /timer/<id>
+                POST /api/mark-task-complete/<id>
+
+Like a browser, each parent keeps cookies and sends If-None-Match for pages
+it has seen. It prints throughput, latency percentiles and errors per route.
+For SQLite it also reports lock wait. Every --probe-ms while the test runs,
+a probe times how long BEGIN IMMEDIATE (taking the write lock) and a small
+read wait on the database file.
+
+    python benchmarks/load_test.py [--users 20] [--duration 30] [--ramp 5] [--think-ms 0]
+                                   [--scale F] [--database URL] [--gunicorn WORKERS]
+                                   [--llm-latency-ms 300] [--llm-ms-per-token 1] [--llm-error-rate 0]
+                                   [--json results.json]
+
+--scale F fills the database with synthetic_data first, so the test runs
+against a realistically sized dataset rather than an empty one.
+"""
+import http.client
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+import llm_stub
+from common import ROOT, AREA_TYPES
+
+
+def arg(name, default, cast=str):
+    return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+
+# ======================
+# APP SERVER
+# ======================
+
+def serve(port):
+    """Child process: serve the app from NURTURA_DATABASE_URL with the threaded Werkzeug server."""
+    from werkzeug.serving import make_server
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.warm_up(app_module.app)
+    server = make_server('127.0.0.1', port, app_module.app, threaded=True)
+    server.serve_forever()
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(env, workers, command=None):
+    """
+    Serve the app in a child process and wait until it answers. `command` is
+    called with the port to get a custom server command line.
+    Returns (process, port).
+    """
+    port = free_port()
+    if command:
+        command = command(port)
+    elif workers:
+        command = ['gunicorn', '-w', str(workers), '--threads', '4', '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', str(port)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/coming-soon')
+            conn.getresponse().read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('app server exited during startup')
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('app server did not start')
+
+
+def prepare_database(database_url, scale):
+    """Migrate (and optionally fill) the database in a child, so this process never imports the app."""
+    script = 'import migrations; migrations.migrate()'
+    if scale:
+        script += f'; import synthetic_data; synthetic_data.generate(scale={scale}, log=lambda line: None)'
+    env = dict(os.environ, NURTURA_DATABASE_URL=database_url)
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+# ======================
+# VIRTUAL PARENTS
+# ======================
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, ms, ok):
+        with self.lock:
+            if ok:
+                self.latencies.setdefault(route, []).append(ms)
+            else:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class Parent:
+    def __init__(self, port, stats, contact):
+        self.port = port
+        self.stats = stats
+        self.contact = contact
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        self.cookies = {}
+        self.etags = {}
+        self.links = {}  # ids found on each page, reused when it answers 304
+
+    def request(self, method, path, route, form=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if form is not None:
+            body = urlencode(form, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if method == 'GET' and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.stats.record(route, 0, False)
+            return None, b''
+        elapsed = (time.perf_counter() - started) * 1000
+
+        for name, value in response.getheaders():
+            if name.lower() == 'set-cookie':
+                cookie_name, _, rest = value.partition('=')
+                self.cookies[cookie_name] = rest.split(';', 1)[0]
+            elif name.lower() == 'etag' and method == 'GET':
+                self.etags[path] = value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.conn.close()
+        self.stats.record(route, elapsed, response.status < 400)
+        return response.status, data
+
+    def onboard(self):
+        self.request('POST', '/parent-entry', 'POST /parent-entry', {'contact_info': self.contact})
+        self.request('POST', '/create-profile', 'POST /create-profile',
+                     {'baby_name': 'Mia', 'age_group': random.choice(('3–6 Months', '6–12 Months', '1–2 Years'))})
+        self.request('POST', '/select-goals', 'POST /select-goals', {'development_goals': AREA_TYPES})
+        self.request('POST', '/api/generate-content', 'POST /api/generate-content')
+
+    def visit(self, think):
+        status, page = self.request('GET', '/home', 'GET /home')
+        if page:
+            self.links['/home'] = re.findall(rb'viewActivities\((\d+)\)', page)
+        area_ids = self.links.get('/home')
+        if not area_ids:
+            return
+        time.sleep(think)
+        area_id = int(random.choice(area_ids))
+        path = f'/activities/{area_id}'
+        status, page = self.request('GET', path, 'GET /activities/<id>')
+        if page:
+            self.links[path] = re.findall(rb'viewTaskDetail\((\d+)\)', page)
+        activity_ids = self.links.get(path)
+        if not activity_ids:
+            return
+        time.sleep(think)
+        activity_id = int(random.choice(activity_ids))
+        self.request('GET', f'/activity/{activity_id}', 'GET /activity/<id>')
+        time.sleep(think)
+        self.request('GET', f'/timer/{activity_id}', 'GET /timer/<id>')
+        time.sleep(think)
+        self.request('POST', f'/api/mark-task-complete/{activity_id}', 'POST /api/mark-task-complete/<id>',
+                     headers={'Idempotency-Key': uuid.uuid4().hex})
+
+    def run(self, start_at, stop_at, think):
+        time.sleep(max(start_at - time.time(), 0))
+        self.onboard()
+        while time.time() < stop_at:
+            self.visit(think)
+            time.sleep(think)
+
+
+# ======================
+# SQLITE LOCK PROBE
+# ======================
+
+def probe_locks(path, interval, stop):
+    """Sample how long the write lock and a read take to get on the database file."""
+    samples = {'write_lock_ms': [], 'read_ms': []}
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    while not stop.wait(interval):
+        started = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        samples['write_lock_ms'].append((time.perf_counter() - started) * 1000)
+        conn.execute('ROLLBACK')
+        started = time.perf_counter()
+        conn.execute('SELECT current_now_playing FROM app_state WHERE id = 1').fetchone()
+        samples['read_ms'].append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return samples
+
+
+def percentile(values, share):
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'p50': round(statistics.median(values), 1),
+        'p90': round(percentile(values, 0.90), 1),
+        'p99': round(percentile(values, 0.99), 1),
+        'max': round(values[-1], 1),
+    }
+
+
+def main():
+    if '--serve' in sys.argv:
+        serve(arg('--serve', 0, int))
+        return
+
+    users = arg('--users', 20, int)
+    duration = arg('--duration', 30, float)
+    ramp = arg('--ramp', 5, float)
+    think = arg('--think-ms', 0, float) / 1000
+    database_url = arg('--database', None) or \
+        'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='nurtura-load-'), 'load.db')
+
+    stub, stub_url = llm_stub.start(latency_ms=arg('--llm-latency-ms', 300, float),
+                                    ms_per_token=arg('--llm-ms-per-token', 1.0, float),
+                                    error_rate=arg('--llm-error-rate', 0.0, float))
+    prepare_database(database_url, arg('--scale', 0, float))
+    env = dict(os.environ,
+               NURTURA_DATABASE_URL=database_url,
+               AI_INTEGRATIONS_ANTHROPIC_BASE_URL=stub_url,
+               AI_INTEGRATIONS_ANTHROPIC_API_KEY='stub',
+               SESSION_SECRET=os.environ.get('SESSION_SECRET', 'load-test'))
+    process, port = start_app(env, arg('--gunicorn', 0, int))
+
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:8]
+    started = time.time()
+    stop_at = started + ramp + duration
+    parents = [Parent(port, stats, f'load-{run_id}-{i}@example.test') for i in range(users)]
+    threads = [threading.Thread(target=parent.run, args=(started + ramp * i / users, stop_at, think))
+               for i, parent in enumerate(parents)]
+
+    stop_probe = threading.Event()
+    probe_result = {}
+    probe = None
+    if database_url.startswith('sqlite:///') and ':memory:' not in database_url:
+        path = database_url[len('sqlite:///'):]
+        probe = threading.Thread(target=lambda: probe_result.update(
+            probe_locks(path, arg('--probe-ms', 100, float) / 1000, stop_probe)))
+        probe.start()
+
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.time() - started
+        stop_probe.set()
+        if probe:
+            probe.join()
+        process.terminate()
+        process.wait()
+        stub.shutdown()
+
+    routes = sorted(set(stats.latencies) | set(stats.errors))
+    results = {'routes': {}, 'lock_wait': {}}
+    print(f"{'route':<38}{'count':>7}{'req/s':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}{'errors':>8}"
+          f"   (ms; {users} users, {elapsed:.0f} s)")
+    for route in routes:
+        latencies = stats.latencies.get(route, [])
+        row = {'count': len(latencies), 'per_sec': round(len(latencies) / elapsed, 1),
+               'errors': stats.errors.get(route, 0)}
+        row.update(summarize(latencies) if latencies else {})
+        results['routes'][route] = row
+        print(f"{route:<38}{row['count']:>7}{row['per_sec']:>8.1f}"
+              + ''.join(f"{row.get(key, 0):>8.1f}" for key in ('p50', 'p90', 'p99', 'max'))
+              + f"{row['errors']:>8}")
+    total = sum(row['count'] for row in results['routes'].values())
+    print(f"{'total':<38}{total:>7}{total / elapsed:>8.1f}")
+
+    for name, samples in probe_result.items():
+        if samples:
+            results['lock_wait'][name] = dict(summarize(samples), samples=len(samples))
+            print(f"lock probe {name:<27}" + ''.join(
+                f"{key} {value:.1f}  " for key, value in results['lock_wait'][name].items() if key != 'samples'))
+
+    if '--json' in sys.argv:
+        with open(arg('--json', None), 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
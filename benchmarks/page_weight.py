@@ -0,0 +1,73 @@
+"""
+Page-weight benchmark per route.
+
+For each mobile-facing page, reports the HTML size, how much of it is inline
+CSS, and the linked stylesheets. "First visit" counts the HTML plus every
+stylesheet; "repeat visit" counts only the HTML, since the fingerprinted
+stylesheets are served from the browser cache. Sizes are raw and gzipped.
+
+    python benchmarks/page_weight.py [--json results.json]
+"""
+import gzip
+import json
+import re
+import sys
+
+from common import make_app, onboard, route_suite
+
+STYLE_BLOCK = re.compile(rb'<style[^>]*>(.*?)</style>', re.S)
+STYLESHEET_LINK = re.compile(rb'<link rel="stylesheet" href="(/static/[^"]+)"')
+
+
+def gzipped_size(data):
+    return len(gzip.compress(data, compresslevel=6))
+
+
+def measure(client, anon_client, path):
+    response = client.get(path)
+    if 300 <= response.status_code < 400:
+        response = anon_client.get(path)
+    html = response.data
+
+    inline_css = sum(len(block) for block in STYLE_BLOCK.findall(html))
+    stylesheets = []
+    for href in STYLESHEET_LINK.findall(html):
+        asset = client.get(href.decode(), headers={'Accept-Encoding': 'identity'})
+        stylesheets.append({'href': href.decode(), 'bytes': len(asset.data),
+                            'gzip_bytes': gzipped_size(asset.data)})
+
+    css_bytes = sum(s['bytes'] for s in stylesheets)
+    css_gzip = sum(s['gzip_bytes'] for s in stylesheets)
+    return {
+        'path': path,
+        'status': response.status_code,
+        'html_bytes': len(html),
+        'html_gzip_bytes': gzipped_size(html),
+        'inline_css_bytes': inline_css,
+        'stylesheets': stylesheets,
+        'first_visit_bytes': len(html) + css_bytes,
+        'first_visit_gzip_bytes': gzipped_size(html) + css_gzip,
+        'repeat_visit_gzip_bytes': gzipped_size(html),
+    }
+
+
+def main():
+    app = make_app()
+    client = app.test_client()
+    ids = onboard(client)
+    anon_client = app.test_client()
+
+    results = {name: measure(client, anon_client, path) for name, path in route_suite(ids).items()}
+
+    print(f"{'route':<16}{'html':>9}{'inline css':>12}{'sheets':>8}{'first (gz)':>12}{'repeat (gz)':>13}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['html_bytes']:>9}{r['inline_css_bytes']:>12}{len(r['stylesheets']):>8}"
+              f"{r['first_visit_gzip_bytes']:>12}{r['repeat_visit_gzip_bytes']:>13}")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
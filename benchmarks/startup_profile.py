@@ -0,0 +1,114 @@
+"""
+Cold-start profile for the Flask app.
+
+Imports `app` in a fresh interpreter several times under `python -X importtime`
+and reports the median import time, the slowest top-level imports, and
+whether any module that should load lazily (the anthropic SDK) was pulled in
+at boot. The script exits non-zero when the median is over the target, so it
+can gate a deploy.
+
+    python benchmarks/startup_profile.py [--runs N] [--target-ms MS] [--top N] [--json results.json]
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MS = 400
+LAZY_MODULES = ['anthropic', 'httpx', 'pydantic']
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+PROBE = (
+    "import sys; import app; "
+    "print('LOADED=' + ','.join(m for m in {lazy!r} if m in sys.modules))"
+)
+
+
+def arg(name, default):
+    return type(default)(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+
+def run_once(workdir):
+    """Import app in a fresh interpreter; return (imports, loaded lazy modules)."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(lazy=LAZY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({
+                'module': name,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': len(indent) // 2,
+            })
+    loaded = result.stdout.strip().rsplit('LOADED=', 1)[-1]
+    return imports, [name for name in loaded.split(',') if name]
+
+
+def app_imports(imports):
+    """The modules app.py imports directly (importtime lists children before their parent)."""
+    index = next(n for n, entry in enumerate(imports) if entry['module'] == 'app')
+    direct = []
+    for entry in reversed(imports[:index]):
+        if entry['depth'] <= imports[index]['depth']:
+            break
+        if entry['depth'] == imports[index]['depth'] + 1:
+            direct.append(entry)
+    return direct
+
+
+def main():
+    runs = arg('--runs', 5)
+    target_ms = arg('--target-ms', TARGET_MS)
+    top = arg('--top', 12)
+
+    # A migrated database, so the boot path is the one production takes.
+    workdir = tempfile.mkdtemp(prefix='nurtura-startup-')
+    subprocess.run([sys.executable, os.path.join(ROOT, 'migrations.py')],
+                   cwd=workdir, capture_output=True, check=True)
+
+    samples = []
+    for _ in range(runs):
+        imports, loaded = run_once(workdir)
+        app_import = next(i for i in imports if i['module'] == 'app')
+        samples.append((app_import['cumulative_us'] / 1000, imports, loaded))
+
+    median_ms = statistics.median(ms for ms, _imports, _loaded in samples)
+    _ms, imports, loaded = min(samples, key=lambda sample: abs(sample[0] - median_ms))
+    direct = sorted(app_imports(imports), key=lambda i: i['cumulative_us'], reverse=True)[:top]
+
+    print(f"import app: median {median_ms:.1f} ms over {runs} runs (target {target_ms} ms)")
+    print(f"{'module':<28}{'cumulative ms':>15}")
+    for entry in direct:
+        print(f"{entry['module']:<28}{entry['cumulative_us'] / 1000:>15.1f}")
+    if loaded:
+        print(f"⚠ loaded at boot but should be lazy: {', '.join(loaded)}")
+    else:
+        print("✓ no lazily-loaded modules imported at boot")
+
+    if '--json' in sys.argv:
+        with open(sys.argv[sys.argv.index('--json') + 1], 'w') as f:
+            json.dump({
+                'median_ms': median_ms,
+                'target_ms': target_ms,
+                'samples_ms': [ms for ms, _imports, _loaded in samples],
+                'eager_lazy_modules': loaded,
+                'imports': imports,
+            }, f, indent=2)
+
+    if median_ms > target_ms or loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
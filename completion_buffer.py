@@ -0,0 +1,140 @@
+"""
+Write-behind buffer that group-commits task completions.
+
+Each finished timer used to be an INSERT plus its own commit, and on SQLite
+every commit is an fsync of the shared file. With the buffer, a request
+queues its completion and waits. A background writer thread collects
+whatever arrives within COMPLETION_BATCH_WINDOW_MS (up to
+COMPLETION_BATCH_MAX rows) and inserts the whole batch with one commit.
+Then it wakes every waiting request. A request only answers after its row
+has been committed, so a completion the client saw acknowledged is durable.
+If the batch fails, every request in it gets the error.
+
+Every completion carries an idempotency key, and the insert is INSERT OR
+IGNORE against a unique index. A retried or double-submitted tap is
+therefore acknowledged without adding a second row.
+
+Each app in each worker process gets its own buffer. The writer thread
+starts on first use, so it is created after gunicorn forks. Batches only
+form when a worker serves several requests at once, which is why
+gunicorn.conf.py runs threaded workers. Set COMPLETION_BATCHING = False to
+write each completion directly.
+"""
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+
+import database
+
+DEFAULT_CONFIG = {
+    'COMPLETION_BATCHING': True,
+    'COMPLETION_BATCH_WINDOW_MS': 2,
+    'COMPLETION_BATCH_MAX': 256,
+    'COMPLETION_ACK_TIMEOUT': 10,
+}
+
+MAX_CLIENT_KEY_LENGTH = 64
+
+
+class _Pending:
+    __slots__ = ('row', 'done', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+
+class CompletionBuffer:
+    def __init__(self, app):
+        self.app = app
+        self.window = app.config['COMPLETION_BATCH_WINDOW_MS'] / 1000
+        self.max_batch = app.config['COMPLETION_BATCH_MAX']
+        self.ack_timeout = app.config['COMPLETION_ACK_TIMEOUT']
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {'batches': 0, 'rows': 0, 'largest_batch': 0}
+
+    def submit(self, baby_id, activity_id, area_id, idempotency_key=None):
+        """Queue one completion and block until its batch is committed."""
+        completed_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        pending = _Pending((baby_id, activity_id, area_id, completed_at, idempotency_key))
+        self._ensure_writer()
+        self._queue.put(pending)
+        if not pending.done.wait(self.ack_timeout):
+            raise TimeoutError('Completion was not committed in time')
+        if pending.error is not None:
+            raise pending.error
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='completion-writer', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first completion, then take what arrives within the window."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Window is over, but anything already queued joins this commit.
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                if remaining <= 0:
+                    break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._collect()
+                error = None
+                try:
+                    database.mark_tasks_complete([pending.row for pending in batch])
+                except Exception as e:
+                    error = e
+                self.stats['batches'] += 1
+                self.stats['rows'] += len(batch)
+                self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+                for pending in batch:
+                    pending.error = error
+                    pending.done.set()
+
+
+def dedupe_key(baby_id, activity_id, client_key=None):
+    """
+    Dedupe key for one completion. A client key (the Idempotency-Key header)
+    identifies one timer run, so retries of that run collapse while a later
+    run of the same task still counts. Without one, a task counts once per
+    baby per UTC day. Keys are scoped to the baby so clients can't collide.
+    """
+    if client_key:
+        return f'{baby_id}:{client_key[:MAX_CLIENT_KEY_LENGTH]}'
+    return f'{baby_id}:{activity_id}:{datetime.now(timezone.utc).date().isoformat()}'
+
+
+def mark_task_complete(baby_id, activity_id, area_id, idempotency_key=None):
+    """Record a completion through the app's buffer, or directly if batching is off."""
+    buffer = current_app.extensions.get('completion_buffer')
+    if buffer is None:
+        database.mark_task_complete(baby_id, activity_id, area_id, idempotency_key)
+    else:
+        buffer.submit(baby_id, activity_id, area_id, idempotency_key)
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if app.config['COMPLETION_BATCHING']:
+        app.extensions['completion_buffer'] = CompletionBuffer(app)
@@ -0,0 +1,150 @@
+"""
+gzip/brotli response compression negotiated from Accept-Encoding.
+
+Applied in an after_request hook to HTML and JSON responses. Assets under
+/static/dist are already precompressed by assets.py and pass through
+untouched, as does anything already encoded or streamed.
+
+Many pages render to byte-identical output between changes (the timer,
+challenge and detail pages, the entry screen). Compressed bodies are
+therefore cached per process, keyed by a hash of the uncompressed body, so
+repeat renders skip the compressor. Hashing is much cheaper than compressing.
+The cache is bounded by total bytes. Pages that differ on every request,
+like /home with its 'now playing' numbers, just age out of it.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'application/json',
+    'text/css',
+    'text/javascript',
+    'application/javascript',
+    'text/plain',
+}
+
+DEFAULT_CONFIG = {
+    'COMPRESS_MIN_SIZE': 500,
+    'COMPRESS_GZIP_LEVEL': 6,
+    'COMPRESS_BROTLI_QUALITY': 5,
+    'COMPRESS_CACHE_BYTES': 8 * 1024 * 1024,
+}
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def choose_encoding():
+    """Best encoding the client accepts that we can produce, or None."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def compress_cached(data, encoding, config):
+    """compress() with a per-process LRU keyed by (encoding, body hash)."""
+    global _cache_bytes
+    key = (encoding, hashlib.sha1(data).digest())
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return cached
+        _stats['misses'] += 1
+
+    compressed = compress(data, encoding, config)
+
+    limit = config['COMPRESS_CACHE_BYTES']
+    if len(compressed) <= limit:
+        with _lock:
+            if key not in _cache:
+                _cache[key] = compressed
+                _cache_bytes += len(compressed)
+            while _cache_bytes > limit:
+                _old_key, old_value = _cache.popitem(last=False)
+                _cache_bytes -= len(old_value)
+    return compressed
+
+
+def clear_cache():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache), bytes=_cache_bytes)
+
+
+def weaken_etag(response):
+    # The compressed bytes are a different representation, so a strong
+    # validator must not be shared with the identity one. Weak comparison
+    # (used for If-None-Match) still matches it.
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response, config):
+    response.vary.add('Accept-Encoding')
+
+    if response.status_code == 304:
+        # Answers for the representation this client would get, which is
+        # compressed whenever it accepts an encoding we produce.
+        if choose_encoding() is not None:
+            weaken_etag(response)
+        return response
+
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress_cached(data, encoding, config))
+    response.headers['Content-Encoding'] = encoding
+    weaken_etag(response)
+    return response
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, app.config)
@@ -0,0 +1,25 @@
+"""
+gunicorn settings picked up automatically from the project root.
+
+Each worker warms itself up once it has loaded the app, before it accepts
+requests, so the first parent to reach a fresh worker doesn't pay for template
+compilation, a cold SQLite file cache or the TLS handshake with Claude.
+Set NURTURA_WARM_LLM=0 to skip the Claude connection (e.g. offline runs).
+Workers serving asgi:app warm up in their ASGI lifespan startup instead.
+
+Workers are threaded (gthread, NURTURA_GUNICORN_THREADS threads, 4 by
+default). Task completions are group-committed per process
+(completion_buffer.py), and a single-threaded sync worker never has two
+taps in the same batch window. A -k/--worker-class on the command line,
+such as the uvicorn worker for asgi:app, still takes precedence.
+"""
+import os
+
+worker_class = 'gthread'
+threads = int(os.environ.get('NURTURA_GUNICORN_THREADS', 4))
+
+
+def post_worker_init(worker):
+    import app
+    if isinstance(worker.wsgi, app.Flask):
+        app.warm_up(worker.wsgi, connect_llm=os.environ.get('NURTURA_WARM_LLM', '1') != '0')
@@ -0,0 +1,520 @@
+"""
+Adaptive concurrency and token-rate limiter for outbound Claude calls.
+
+Every messages.create() that ai_service makes (run_call and run_call_async)
+first takes a lease here and gives it back when the answer arrives. The
+limit is shared by every worker on the host through a small SQLite file
+(LLM_LIMITER_FILE). That file holds one row per call in flight, the
+current concurrency limit and a token bucket. Lease rows of a worker that
+died are reaped.
+
+- Concurrency adapts AIMD-style. Each successful call raises the limit by
+  1/limit, which is about +1 per limit's worth of calls, up to
+  LLM_MAX_CONCURRENCY. Other errors (timeouts, 5xx, dropped connections)
+  and cancelled calls leave it as it is. A 429 or 529 answer halves it,
+  down to LLM_MIN_CONCURRENCY, at most once per round of calls in flight.
+  It also pauses all new calls for the answer's retry-after (or
+  LLM_BACKOFF_SECONDS). The throttled call is then retried LLM_RETRIES
+  times, so a burst of rate limits doesn't come back as empty generations.
+- With LLM_TOKENS_PER_MINUTE set, a call also needs its estimated tokens
+  (max_tokens plus the prompt length / 4) from a bucket that refills at
+  that rate. The estimate is corrected with the answer's usage.
+- Calls that can't start yet wait in a per-worker queue that takes turns
+  between babies (the session's baby, else its parent, else "background"
+  outside a request). So one baby's burst of generations doesn't hold up
+  everyone else's. A call that waits longer than LLM_QUEUE_TIMEOUT_SECONDS
+  fails with LimiterTimeout, and its generate_* function falls back as on
+  any other error.
+
+    GET /debug/llm-limiter  this worker's queue depth (total and per baby), wait times
+                            and counters, plus the shared limit, calls in flight and tokens
+
+Like /debug/profile, the endpoint exists only when NURTURA_PROFILING_TOKEN is
+set. The limiter itself is on unless NURTURA_LLM_LIMITER=0.
+"""
+import asyncio
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Blueprint, current_app, has_request_context, jsonify, session
+
+import profiling
+
+DEFAULT_CONFIG = {
+    'LLM_LIMITER': os.environ.get('NURTURA_LLM_LIMITER', '1') != '0',
+    'LLM_LIMITER_FILE': os.environ.get('NURTURA_LLM_LIMITER_FILE',
+                                       os.path.join(tempfile.gettempdir(), 'nurtura-llm-limiter.db')),
+    'LLM_MAX_CONCURRENCY': int(os.environ.get('NURTURA_LLM_MAX_CONCURRENCY', 32)),
+    'LLM_MIN_CONCURRENCY': 1,
+    'LLM_TOKENS_PER_MINUTE': int(os.environ.get('NURTURA_LLM_TOKENS_PER_MINUTE', 0)),  # 0: no token limit
+    'LLM_BACKOFF_SECONDS': 2.0,
+    'LLM_RETRIES': 2,
+    'LLM_QUEUE_TIMEOUT_SECONDS': 60,
+}
+
+# A lease older than this is taken to be left over from a crashed call.
+LEASE_SECONDS = 900
+# How often the call at the head of a worker's queue asks the shared state again.
+POLL_SECONDS = 0.05
+
+THROTTLED_STATUSES = (429, 529)
+
+bp = Blueprint('llm_limiter', __name__, url_prefix='/debug/llm-limiter')
+
+
+class LimiterTimeout(Exception):
+    """A Claude call waited longer than LLM_QUEUE_TIMEOUT_SECONDS for a lease."""
+
+
+def estimate_tokens(request):
+    """Tokens a messages.create() request may use: max_tokens plus about 4 characters per prompt token."""
+    chars = 0
+    for turn in request.get('messages', []):
+        content = turn.get('content', '')
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(part.get('text', '')) for part in content if isinstance(part, dict))
+    return request.get('max_tokens', 0) + chars // 4
+
+
+def used_tokens(response):
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    return (usage.input_tokens or 0) + (usage.output_tokens or 0)
+
+
+def retry_after(error, default):
+    """Seconds to pause after a throttled answer, from its retry-after header."""
+    response = getattr(error, 'response', None)
+    try:
+        return max(float(response.headers.get('retry-after')), 0.0)
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# ======================
+# SHARED STATE
+# ======================
+
+class SharedState:
+    """The limit, token bucket and leases that every worker on the host shares, in one SQLite file."""
+
+    def __init__(self, path, max_concurrency, min_concurrency=1, tokens_per_minute=0):
+        self.path = path
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.lock = threading.Lock()
+        self.conn = None  # opened by the first transaction, so building an app touches no file
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                concurrency REAL NOT NULL,
+                tokens REAL NOT NULL,
+                refilled_at REAL NOT NULL,
+                backoff_until REAL NOT NULL DEFAULT 0,
+                decreased_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pid INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+        ''')
+        conn.execute('INSERT OR IGNORE INTO state (id, concurrency, tokens, refilled_at) VALUES (1, ?, ?, ?)',
+                     (self.max_concurrency, self.tokens_per_minute, time.time()))
+        return conn
+
+    def transaction(self, work):
+        """Run work(conn, state row) in one BEGIN IMMEDIATE transaction, so workers take turns."""
+        with self.lock:
+            if self.conn is None:
+                self.conn = self.connect()
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(
+                    'SELECT concurrency, tokens, refilled_at, backoff_until, decreased_at FROM state WHERE id = 1'
+                ).fetchone()
+                result = work(self.conn, *row)
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+
+    def refill(self, tokens, refilled_at, now):
+        if not self.tokens_per_minute:
+            return tokens
+        return min(self.tokens_per_minute, tokens + (now - refilled_at) * self.tokens_per_minute / 60)
+
+    def admit(self, tokens):
+        """
+        Take a lease for a call needing `tokens`. Returns (lease, 0) or
+        (None, seconds worth waiting before asking again).
+        """
+        def work(conn, concurrency, bucket, refilled_at, backoff_until, decreased_at):
+            now = time.time()
+            if now < backoff_until:
+                return None, backoff_until - now
+            limit = max(self.min_concurrency, min(int(concurrency), self.max_concurrency))
+            in_flight = conn.execute('SELECT COUNT(*) FROM leases').fetchone()[0]
+            if in_flight >= limit:
+                in_flight -= self.reap(conn, now)
+                if in_flight >= limit:
+                    return None, POLL_SECONDS
+            bucket = self.refill(bucket, refilled_at, now)
+            need = min(tokens, self.tokens_per_minute)
+            if self.tokens_per_minute and bucket < need:
+                conn.execute('UPDATE state SET tokens = ?, refilled_at = ? WHERE id = 1', (bucket, now))
+                return None, (need - bucket) * 60 / self.tokens_per_minute
+            lease_id = conn.execute('INSERT INTO leases (pid, started_at, tokens) VALUES (?, ?, ?)',
+                                    (os.getpid(), now, need)).lastrowid
+            conn.execute('UPDATE state SET tokens = ?, refilled_at = ? WHERE id = 1', (bucket - need, now))
+            return (lease_id, now, need), 0
+
+        return self.transaction(work)
+
+    def reap(self, conn, now):
+        """Delete the leases of dead workers and of calls older than LEASE_SECONDS. Returns how many."""
+        stale = [lease_id for lease_id, pid, started_at in conn.execute('SELECT id, pid, started_at FROM leases')
+                 if started_at < now - LEASE_SECONDS or (pid != os.getpid() and not pid_alive(pid))]
+        conn.executemany('DELETE FROM leases WHERE id = ?', [(lease_id,) for lease_id in stale])
+        return len(stale)
+
+    def release(self, lease, outcome, used=None, throttled_for=None):
+        """
+        Give a lease back. `outcome` is 'succeeded', 'throttled' (a 429/529,
+        with throttled_for the pause in seconds), 'failed' or 'cancelled'.
+        Only a success raises the limit. `used` is the tokens the call
+        actually used. Returns the new concurrency limit.
+        """
+        lease_id, started_at, taken = lease
+
+        def work(conn, concurrency, bucket, refilled_at, backoff_until, decreased_at):
+            now = time.time()
+            conn.execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+            bucket = self.refill(bucket, refilled_at, now)
+            if self.tokens_per_minute and used is not None:
+                bucket = max(min(bucket + taken - used, self.tokens_per_minute), -self.tokens_per_minute)
+            if outcome == 'succeeded':
+                concurrency = min(self.max_concurrency, concurrency + 1 / max(concurrency, 1))
+            elif outcome == 'throttled':
+                # Calls that started before the last cut saw the old limit; one cut per round.
+                if started_at >= decreased_at:
+                    concurrency = max(self.min_concurrency, concurrency / 2)
+                    decreased_at = now
+                backoff_until = max(backoff_until, now + throttled_for)
+            conn.execute('UPDATE state SET concurrency = ?, tokens = ?, refilled_at = ?, backoff_until = ?, '
+                         'decreased_at = ? WHERE id = 1', (concurrency, bucket, now, backoff_until, decreased_at))
+            return concurrency
+
+        return self.transaction(work)
+
+    def snapshot(self):
+        def work(conn, concurrency, bucket, refilled_at, backoff_until, decreased_at):
+            now = time.time()
+            by_pid = dict(conn.execute('SELECT pid, COUNT(*) FROM leases GROUP BY pid').fetchall())
+            return {
+                'concurrency_limit': round(concurrency, 2),
+                'max_concurrency': self.max_concurrency,
+                'in_flight': sum(by_pid.values()),
+                'in_flight_by_pid': by_pid,
+                'tokens_available': round(self.refill(bucket, refilled_at, now)) if self.tokens_per_minute else None,
+                'tokens_per_minute': self.tokens_per_minute or None,
+                'backoff_seconds': round(max(backoff_until - now, 0), 2),
+            }
+
+        return self.transaction(work)
+
+
+# ======================
+# PER-WORKER FAIR QUEUE
+# ======================
+
+class Limiter:
+    """
+    A worker's queue in front of the shared state. Waiting calls are kept
+    per key (baby) and the head of the queue takes turns between keys.
+    Only the head asks the shared state for a lease.
+    """
+
+    def __init__(self, shared, key_func=lambda: 'background', retries=2, backoff_seconds=2.0, queue_timeout=60):
+        self.shared = shared
+        self.key_func = key_func
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.queue_timeout = queue_timeout
+        self.cond = threading.Condition()
+        self.queues = {}
+        self.turns = deque()
+        self.tickets = itertools.count()
+        self.counters = Counter()
+        self.waits = deque(maxlen=1000)
+        self.max_depth = 0
+
+    # Queue
+
+    def enqueue(self, key):
+        with self.cond:
+            ticket = next(self.tickets)
+            if key not in self.queues:
+                self.queues[key] = deque()
+                self.turns.append(key)
+            self.queues[key].append(ticket)
+            self.max_depth = max(self.max_depth, self.depth())
+            return ticket
+
+    def depth(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def leave(self, key, ticket, admitted):
+        """
+        Take a ticket out of the queue. When it was admitted, its key goes
+        to the back of the turns if it still has calls waiting.
+        """
+        queue = self.queues[key]
+        queue.remove(ticket)
+        if not queue:
+            del self.queues[key]
+            self.turns.remove(key)
+        elif admitted:
+            self.turns.remove(key)
+            self.turns.append(key)
+        self.cond.notify_all()
+
+    def at_head(self, ticket):
+        with self.cond:
+            return self.queues[self.turns[0]][0] == ticket
+
+    def admitted(self, key, ticket, lease):
+        with self.cond:
+            self.leave(key, ticket, admitted=True)
+        return lease
+
+    # self.cond guards only the in-memory queue and is never held across the
+    # shared state's SQLite transaction, so waiting on the file (up to its
+    # busy timeout) doesn't block other threads or the event loop. Only the
+    # head ticket asks, and only its own call can move it off the head, so
+    # the head check stays valid while the lease is taken.
+
+    def try_admit(self, key, ticket, tokens):
+        """(lease, 0) if this ticket is at the head and got a lease, else (None, seconds to wait)."""
+        if not self.at_head(ticket):
+            return None, POLL_SECONDS
+        lease, wait = self.shared.admit(tokens)
+        if lease is not None:
+            self.admitted(key, ticket, lease)
+        return lease, wait
+
+    async def try_admit_async(self, key, ticket, tokens):
+        """try_admit() with the SQLite transaction on a thread, off the event loop."""
+        if not self.at_head(ticket):
+            return None, POLL_SECONDS
+        lease, wait = await asyncio.to_thread(self.shared.admit, tokens)
+        if lease is not None:
+            self.admitted(key, ticket, lease)
+        return lease, wait
+
+    def give_up(self, key, ticket, started):
+        self.counters['timeouts'] += 1
+        raise LimiterTimeout(f"No Claude capacity after waiting {time.monotonic() - started:.0f} s")
+
+    def abandon(self, key, ticket):
+        """
+        Take a ticket that is still waiting out of the queue (timeout, error
+        or cancellation). A dead ticket at the head would block every call
+        behind it.
+        """
+        with self.cond:
+            if ticket in self.queues.get(key, ()):
+                self.leave(key, ticket, admitted=False)
+
+    def acquire(self, key, tokens):
+        started = time.monotonic()
+        ticket = self.enqueue(key)
+        try:
+            while True:
+                lease, wait = self.try_admit(key, ticket, tokens)
+                if lease is not None:
+                    self.waits.append(time.monotonic() - started)
+                    return lease
+                remaining = started + self.queue_timeout - time.monotonic()
+                if remaining <= 0:
+                    self.give_up(key, ticket, started)
+                with self.cond:
+                    # Woken early when a call in this worker leaves the queue.
+                    self.cond.wait(min(wait, POLL_SECONDS, remaining))
+        except BaseException:
+            self.abandon(key, ticket)
+            raise
+
+    async def acquire_async(self, key, tokens):
+        started = time.monotonic()
+        ticket = self.enqueue(key)
+        try:
+            while True:
+                lease, wait = await self.try_admit_async(key, ticket, tokens)
+                if lease is not None:
+                    self.waits.append(time.monotonic() - started)
+                    return lease
+                remaining = started + self.queue_timeout - time.monotonic()
+                if remaining <= 0:
+                    self.give_up(key, ticket, started)
+                await asyncio.sleep(min(wait, POLL_SECONDS, remaining))
+        except BaseException:
+            self.abandon(key, ticket)
+            raise
+
+    # Calls
+
+    def outcome(self, response=None, error=None):
+        """Count a call's outcome. Returns the release() arguments and whether to retry."""
+        if error is None:
+            self.counters['succeeded'] += 1
+            return {'outcome': 'succeeded', 'used': used_tokens(response)}, False
+        if getattr(error, 'status_code', None) not in THROTTLED_STATUSES:
+            self.counters['errors'] += 1
+            return {'outcome': 'failed'}, False
+        self.counters['throttled'] += 1
+        return {'outcome': 'throttled', 'throttled_for': retry_after(error, self.backoff_seconds)}, True
+
+    def report(self, error, release, limit):
+        if release['outcome'] == 'throttled':
+            print(f"⚠ Claude answered {error.status_code}; concurrency limit now {limit:.1f}, "
+                  f"pausing {release['throttled_for']:.1f} s")
+
+    def finish(self, lease, response=None, error=None):
+        """Release a lease. Returns True if the error was a 429/529 worth retrying."""
+        release, retry = self.outcome(response, error)
+        self.report(error, release, self.shared.release(lease, **release))
+        return retry
+
+    async def finish_async(self, lease, response=None, error=None):
+        """finish() with the SQLite transaction on a thread, off the event loop."""
+        release, retry = self.outcome(response, error)
+        self.report(error, release, await asyncio.to_thread(self.shared.release, lease, **release))
+        return retry
+
+    def call(self, create, request):
+        """create() (a messages.create call for `request`) under a lease, retrying 429/529 answers."""
+        key = self.key_func()
+        tokens = estimate_tokens(request)
+        for attempt in range(self.retries + 1):
+            lease = self.acquire(key, tokens)
+            try:
+                response = create()
+            except Exception as e:
+                if self.finish(lease, error=e) and attempt < self.retries:
+                    self.counters['retried'] += 1
+                    continue
+                raise
+            except BaseException:
+                # Cancelled or interrupted: give the lease back rather than leave it to the reaper.
+                self.shared.release(lease, 'cancelled')
+                raise
+            self.finish(lease, response)
+            return response
+
+    async def call_async(self, create, request):
+        """call() for the async client; create() returns an awaitable."""
+        key = self.key_func()
+        tokens = estimate_tokens(request)
+        for attempt in range(self.retries + 1):
+            lease = await self.acquire_async(key, tokens)
+            try:
+                response = await create()
+            except Exception as e:
+                if await self.finish_async(lease, error=e) and attempt < self.retries:
+                    self.counters['retried'] += 1
+                    continue
+                raise
+            except BaseException:
+                # Cancelled: give the lease back rather than leave it to the reaper.
+                # Shielded, so a second cancellation can't interrupt the release.
+                await asyncio.shield(asyncio.to_thread(self.shared.release, lease, 'cancelled'))
+                raise
+            await self.finish_async(lease, response)
+            return response
+
+    # Metrics
+
+    def stats(self):
+        with self.cond:
+            by_key = sorted(((key, len(queue)) for key, queue in self.queues.items()), key=lambda item: -item[1])
+            depth = self.depth()
+            max_depth = self.max_depth
+        waits = sorted(self.waits)
+
+        def percentile(p):
+            return round(waits[min(int(len(waits) * p), len(waits) - 1)] * 1000, 1) if waits else 0.0
+
+        return {
+            'pid': os.getpid(),
+            'queue_depth': depth,
+            'max_queue_depth': max_depth,
+            'queue_by_key': dict(by_key[:20]),
+            'waiting_keys': len(by_key),
+            'wait_ms': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99),
+                        'max': round(waits[-1] * 1000, 1) if waits else 0.0},
+            'counters': {name: self.counters[name]
+                         for name in ('succeeded', 'throttled', 'retried', 'errors', 'timeouts')},
+            'shared': self.shared.snapshot(),
+        }
+
+
+# ======================
+# ADMIN ENDPOINT
+# ======================
+
+bp.before_request(profiling.require_token)
+
+
+@bp.route('')
+def limiter_stats():
+    return jsonify(current_app.extensions['llm_limiter'].stats())
+
+
+def request_key():
+    """The queue key of the current call: the session's baby, else its parent, else "background"."""
+    if has_request_context():
+        return session.get('baby_uuid') or session.get('parent_id') or 'anonymous'
+    return 'background'
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['LLM_LIMITER']:
+        return
+
+    shared = SharedState(app.config['LLM_LIMITER_FILE'], app.config['LLM_MAX_CONCURRENCY'],
+                         app.config['LLM_MIN_CONCURRENCY'], app.config['LLM_TOKENS_PER_MINUTE'])
+    # ai_service.current_limiter() finds it here
+    app.extensions['llm_limiter'] = Limiter(
+        shared, request_key, app.config['LLM_RETRIES'], app.config['LLM_BACKOFF_SECONDS'],
+        app.config['LLM_QUEUE_TIMEOUT_SECONDS'],
+    )
+    if app.config.get('PROFILING_TOKEN'):
+        app.register_blueprint(bp)
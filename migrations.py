@@ -0,0 +1,289 @@
+"""
+Versioned schema migrations.
+
+Each migration is a function taking an open connection, listed in MIGRATIONS
+in order and applied at most once. Applied versions are recorded in the
+schema_version table. Migrations are run by a deploy step, not by the web
+workers:
+
+    flask --app app migrate
+    python migrations.py            # same thing, without Flask
+    python migrations.py status
+
+On boot the app only reads the current version number, which is a single
+read with no writes and no locks. If the database is behind, every request
+gets a 503 until the migrations have run.
+
+Each migration runs in one transaction with its schema_version row, and is
+rolled back if it fails. Migrations are also written to be safe to re-run
+(IF NOT EXISTS, column_exists()), so a database that was changed by hand
+or by a half-applied older release still upgrades cleanly.
+
+To change the schema, append a function and a new entry to MIGRATIONS.
+Never edit a migration that has already shipped.
+"""
+import os
+import random
+import sqlite3
+import sys
+
+from flask import abort
+
+import database
+
+
+def column_exists(conn, table, column):
+    """Whether `table` already has `column`, so an ADD COLUMN can be skipped."""
+    if database.dialect(conn) == 'postgres':
+        row = conn.execute('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ? AND column_name = ?
+        ''', (table, column)).fetchone()
+        return row is not None
+    return any(row['name'] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def baseline(conn):
+    """
+    Every table and column the app had before versioned migrations. Like
+    every migration, it leaves the commit to migrate().
+    """
+    if database.dialect(conn) == 'postgres':
+        import postgres_backend
+        postgres_backend.create_schema(conn)
+        conn.execute('INSERT INTO app_state (id, current_now_playing) VALUES (1, ?) ON CONFLICT DO NOTHING',
+                     (random.randint(101, 999),))
+        if conn.execute('SELECT COUNT(*) FROM activities').fetchone()[0] == 0:
+            database.seed_activities(conn)
+    else:
+        database.init_db(conn)
+
+
+def add_completion_idempotency_key(conn):
+    """
+    Retried or double-submitted completions share a key, and the unique
+    index turns the repeat into a no-op. Older rows keep a NULL key, and
+    NULLs never conflict in either SQLite or Postgres.
+    """
+    if not column_exists(conn, 'task_completions', 'idempotency_key'):
+        conn.execute('ALTER TABLE task_completions ADD COLUMN idempotency_key TEXT')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_task_completions_idempotency_key
+        ON task_completions (idempotency_key)
+    ''')
+
+
+def add_daily_progress(conn):
+    """
+    Per-baby, per-day, per-area rollup of task_completions. It is backfilled
+    here and kept current by an AFTER INSERT trigger, so every write path
+    (direct, group commit, INSERT OR IGNORE) updates it in the same
+    transaction as the completion. Ignored duplicates never fire the trigger.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_progress (
+            baby_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            area_id INTEGER NOT NULL,
+            completions INTEGER NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (baby_id, day, area_id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO daily_progress (baby_id, day, area_id, completions, minutes)
+        SELECT tc.baby_id, DATE(tc.completed_at), tc.area_id, COUNT(*), SUM(COALESCE(aa.duration_min, 0))
+        FROM task_completions tc
+        LEFT JOIN area_activities aa ON aa.id = tc.activity_id
+        GROUP BY tc.baby_id, DATE(tc.completed_at), tc.area_id
+    ''')
+
+    upsert = '''
+        INSERT INTO daily_progress (baby_id, day, area_id, completions, minutes)
+        VALUES (NEW.baby_id, DATE(NEW.completed_at), NEW.area_id, 1,
+                COALESCE((SELECT duration_min FROM area_activities WHERE id = NEW.activity_id), 0))
+        ON CONFLICT (baby_id, day, area_id) DO UPDATE SET
+            completions = daily_progress.completions + 1,
+            minutes = daily_progress.minutes + excluded.minutes;
+    '''
+    if database.dialect(conn) == 'postgres':
+        conn.execute(f'''
+            CREATE OR REPLACE FUNCTION task_completions_daily_progress() RETURNS trigger AS $$
+            BEGIN
+                {upsert}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        conn.execute('DROP TRIGGER IF EXISTS task_completions_daily_progress ON task_completions')
+        conn.execute('''
+            CREATE TRIGGER task_completions_daily_progress AFTER INSERT ON task_completions
+            FOR EACH ROW EXECUTE FUNCTION task_completions_daily_progress()
+        ''')
+    else:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS task_completions_daily_progress
+            AFTER INSERT ON task_completions
+            BEGIN
+                {upsert}
+            END
+        ''')
+
+
+def add_challenge_progress(conn):
+    """
+    One log row per enrollment per challenge day, plus last_logged_day on the
+    enrollment. With both, the home page reads progress from the enrollment
+    row alone. Existing counters are rebuilt from the logs.
+    """
+    conn.execute('''
+        DELETE FROM challenge_daily_logs WHERE id NOT IN (
+            SELECT MIN(id) FROM challenge_daily_logs GROUP BY enrollment_id, day_number
+        )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_challenge_daily_logs_enrollment_day
+        ON challenge_daily_logs (enrollment_id, day_number)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_challenge_enrollments_baby_status
+        ON challenge_enrollments (baby_id, status, started_at)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_challenge_activities_challenge_day
+        ON challenge_activities (challenge_id, day_number)
+    ''')
+    if not column_exists(conn, 'challenge_enrollments', 'last_logged_day'):
+        conn.execute('ALTER TABLE challenge_enrollments ADD COLUMN last_logged_day INTEGER DEFAULT 0')
+    conn.execute('''
+        UPDATE challenge_enrollments SET
+            completed_days = (SELECT COUNT(*) FROM challenge_daily_logs l
+                              WHERE l.enrollment_id = challenge_enrollments.id),
+            last_logged_day = (SELECT COALESCE(MAX(day_number), 0) FROM challenge_daily_logs l
+                               WHERE l.enrollment_id = challenge_enrollments.id)
+    ''')
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', baseline),
+    (2, 'task completion idempotency keys', add_completion_idempotency_key),
+    (3, 'daily progress rollup', add_daily_progress),
+    (4, 'challenge progress', add_challenge_progress),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def current_version(conn=None):
+    """
+    Highest applied migration, or 0 for a database that predates them.
+    A missing SQLite file is version 0 too, and is not created by asking.
+    """
+    close_conn = conn is None
+    if close_conn:
+        backend = database.get_backend()
+        if isinstance(backend, database.SQLiteFileBackend) and not os.path.exists(backend.path):
+            return 0
+        conn = database.get_db_connection()
+    try:
+        row = conn.execute('SELECT MAX(version) AS version FROM schema_version').fetchone()
+        return row['version'] or 0
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def pending_migrations(version):
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def migrate(conn=None):
+    """Apply every pending migration in order. Returns the number applied."""
+    close_conn = conn is None
+    if close_conn:
+        conn = database.get_db_connection()
+    _ensure_version_table(conn)
+    pending = pending_migrations(current_version(conn))
+
+    try:
+        for version, name, upgrade in pending:
+            print(f"⟳ Applying migration {version}: {name}")
+            # sqlite3 runs DDL outside a transaction unless one is open
+            if database.dialect(conn) == 'sqlite' and not conn.in_transaction:
+                conn.execute('BEGIN')
+            try:
+                upgrade(conn)
+                conn.execute(
+                    'INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)',
+                    (version, name)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"⚠ Migration {version} failed and was rolled back")
+                raise
+            print(f"✓ Migration {version} applied")
+    finally:
+        if close_conn:
+            conn.close()
+    if not pending:
+        print(f"✓ Database schema is current (version {LATEST_VERSION})")
+    return len(pending)
+
+
+def schema_is_current():
+    return current_version() >= LATEST_VERSION
+
+
+def init_app(app):
+    """
+    Register `flask migrate` and the boot-time version check.
+    The check never writes. A stale database is reported once at boot, and
+    requests get a 503 until the migrations have run. After that the app
+    stops checking. With AUTO_MIGRATE set (tests, benchmarks, in-memory
+    databases), pending migrations are applied right away instead.
+    """
+    with app.app_context():
+        if app.config.get('AUTO_MIGRATE'):
+            migrate()
+        state = {'current': schema_is_current()}
+        if not state['current']:
+            print(f"⚠ Database schema is at version {current_version()}, expected {LATEST_VERSION}. "
+                  f"Run `flask --app app migrate`.")
+
+    @app.before_request
+    def _require_current_schema():
+        if state['current']:
+            return None
+        state['current'] = schema_is_current()
+        if not state['current']:
+            abort(503, description='Database migrations are pending. Run `flask --app app migrate`.')
+        return None
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending database migrations."""
+        migrate()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        version = current_version()
+        print(f"Schema version {version} of {LATEST_VERSION}")
+        for pending_version, name, _upgrade in pending_migrations(version):
+            print(f"  pending: {pending_version} {name}")
+    else:
+        migrate()
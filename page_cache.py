@@ -0,0 +1,157 @@
+"""
+Rendered-fragment cache and conditional-GET helpers.
+
+Fragments are cached per app in each worker process. Callers key them by whatever makes
+the markup unique (usually baby_id plus a content version read from the
+database), so a new area or challenge changes the key and the old entry is
+simply never asked for again.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, request, make_response, session
+
+MAX_FRAGMENTS = 1024
+
+_lock = threading.Lock()
+_build_ids = {}
+
+SLOT_PATTERN = re.compile(r'<!--slot:(\w+):(\w+)-->')
+
+
+def init_app(app):
+    app.extensions['page_cache'] = OrderedDict()
+
+
+def _fragments():
+    # Per app, so apps on different databases never share fragments.
+    return current_app.extensions.setdefault('page_cache', OrderedDict())
+
+
+def get_fragment(key):
+    """Return cached HTML for key, or None on a miss."""
+    fragments = _fragments()
+    with _lock:
+        html = fragments.get(key)
+        if html is not None:
+            fragments.move_to_end(key)
+        return html
+
+
+def set_fragment(key, html):
+    """Store rendered HTML for key, evicting the least recently used entry."""
+    fragments = _fragments()
+    with _lock:
+        fragments[key] = html
+        fragments.move_to_end(key)
+        while len(fragments) > MAX_FRAGMENTS:
+            fragments.popitem(last=False)
+
+
+def clear_fragments():
+    fragments = _fragments()
+    with _lock:
+        fragments.clear()
+
+
+def fill_slots(html, name, values):
+    """
+    Replace <!--slot:name:key--> markers with values[key].
+    Markers live in cached fragments where volatile numbers go
+    (e.g. per-area 'now playing'), so the fragment itself stays cacheable.
+    Keys are matched as strings.
+    """
+    def replace(match):
+        if match.group(1) != name:
+            return match.group(0)
+        return str(values.get(match.group(2), ''))
+
+    return SLOT_PATTERN.sub(replace, html)
+
+
+def build_id(template_folder, *extra):
+    """
+    Hash of the template sources (plus any extra version strings, such as the
+    asset manifest version), computed once per process for each template
+    folder and set of extras. Mixed into every ETag so a deploy with changed
+    markup or asset URLs never answers 304.
+    """
+    key = (template_folder, extra)
+    build = _build_ids.get(key)
+    if build is None:
+        digest = hashlib.sha1()
+        for value in extra:
+            digest.update(str(value).encode('utf-8'))
+        for root, _dirs, files in sorted(os.walk(template_folder)):
+            for filename in sorted(files):
+                with open(os.path.join(root, filename), 'rb') as f:
+                    digest.update(f.read())
+        build = _build_ids[key] = digest.hexdigest()[:12]
+    return build
+
+
+def make_etag(*parts):
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def row_timestamp(value):
+    """Parse a SQLite CURRENT_TIMESTAMP string (UTC) into an aware datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.replace(microsecond=0)
+
+
+def latest(*timestamps):
+    """Newest of the given row timestamps (strings or datetimes), ignoring blanks."""
+    parsed = [row_timestamp(value) for value in timestamps]
+    parsed = [value for value in parsed if value]
+    return max(parsed) if parsed else None
+
+
+def start_of_today():
+    """UTC midnight; 'done today' flips here without any row changing."""
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    True if the client's cached copy is still current.
+    If-None-Match wins over If-Modified-Since (RFC 9110). Pages with pending
+    flash messages are never answered with 304, since the flash is part of the body.
+    """
+    if '_flashes' in session:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    return _add_validators(make_response('', 304), etag, last_modified)
+
+
+def with_etag(body, etag, last_modified=None):
+    """Wrap a rendered page in a response carrying its validators."""
+    return _add_validators(make_response(body), etag, last_modified)
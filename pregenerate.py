@@ -0,0 +1,257 @@
+"""
+Off-peak pre-generation of tomorrow's daily activities and of challenge
+curricula.
+
+    flask --app app pregenerate-daily [--date YYYY-MM-DD] [--at HH:MM] [--batch/--no-batch]
+    flask --app app pregenerate-challenges [--days 10] [--batch/--no-batch]
+
+A run fills daily_activities for one day (tomorrow by default) for every
+active baby that doesn't have a row yet. A baby is active if it had a task
+completion, or was created, within PREGENERATE_ACTIVE_DAYS. The run groups
+babies by age bucket and development goals and asks Claude once per group
+for PREGENERATE_VARIANTS activities, up to PREGENERATE_CONCURRENCY calls at
+a time. Each baby then gets one of its group's variants. So the number of
+Claude calls depends on the number of distinct groups (at most 6 buckets x
+15 goal sets), not on the number of babies. Rows are written
+PREGENERATE_BATCH_SIZE at a time with INSERT OR IGNORE. A run can therefore
+be repeated or resumed, and it never replaces a row that
+GET /api/daily-activity generated on demand.
+
+With --at, the command keeps running and starts a run every day at that
+local time. Run it as one scheduler process, or call it from cron without
+--at. It should not run inside the web workers, because each worker would
+start its own run.
+
+pregenerate-challenges writes the first --days activities of every
+challenge that has none yet. Otherwise the first parent to open that
+challenge waits for them (view_challenge).
+
+With --batch (PREGENERATE_BATCH_API), both jobs send their Claude calls as
+one Message Batches submission (ai_service.run_batch()) rather than as
+concurrent synchronous calls. Batched requests cost half as much and don't
+use the synchronous rate limits, but take minutes to finish.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import click
+
+import ai_service
+import database
+
+DEFAULT_CONFIG = {
+    'PREGENERATE_ACTIVE_DAYS': 14,
+    'PREGENERATE_VARIANTS': 3,
+    'PREGENERATE_BATCH_SIZE': 5000,
+    'PREGENERATE_CONCURRENCY': 4,
+    'PREGENERATE_BATCH_API': False,
+}
+
+# Challenge activities are shared by every baby. The batch job writes them
+# for a one-year-old.
+CHALLENGE_AGE_MONTHS = 12
+
+# (upper bound in months, label, months the prompt uses), matching the age groups on /create-profile.
+AGE_BUCKETS = (
+    (3, '0–3 Months', 2),
+    (6, '3–6 Months', 5),
+    (12, '6–12 Months', 9),
+    (24, '1–2 Years', 18),
+    (48, '2–4 Years', 36),
+    (None, '4–6 Years', 60),
+)
+
+
+def age_bucket(age_months):
+    """(label, representative months) of the bucket an age falls in."""
+    for upper, label, months in AGE_BUCKETS:
+        if upper is None or (age_months or 0) <= upper:
+            return label, months
+
+
+def goals_of(baby):
+    try:
+        return tuple(sorted(json.loads(baby['development_goals'] or '[]')))
+    except (TypeError, ValueError):
+        return ()
+
+
+def daily_activity_row(baby_id, parent_id, activity_date, age_label, activity):
+    """One daily_activities row (database.DAILY_ACTIVITY_COLUMNS order) from a generated activity."""
+    return (
+        baby_id, parent_id, activity_date.isoformat(),
+        activity.get('title', 'Activity of the Day'),
+        activity.get('short_teaser', ''),
+        activity.get('what_you_need', ''),
+        activity.get('full_instructions', ''),
+        activity.get('why_it_matters', ''),
+        activity.get('tips', ''),
+        activity.get('duration', '10-15 min'),
+        age_label,
+        activity.get('goal_focus', ''),
+        activity.get('domain', activity.get('goal_focus', '')),
+    )
+
+
+def generate_all(calls, use_batches=False, concurrency=4, log=print):
+    """
+    Run {key: (ai_service function, args)} and return {key: result}, through
+    the Message Batches API or with up to `concurrency` calls at a time.
+    """
+    if use_batches:
+        return ai_service.run_batch(calls, log=log)
+
+    def generate(key):
+        function, args = calls[key]
+        return key, function(*args)
+
+    with ThreadPoolExecutor(max(concurrency, 1)) as pool:
+        return dict(pool.map(generate, calls))
+
+
+def challenge_activity_rows(activities):
+    """save_challenge_activities() dicts from generate_challenge_daily_activities() results."""
+    return [
+        {
+            'day_number': activity['day_number'],
+            'activity_title': activity['title'],
+            'activity_description': activity['description'],
+            'materials': json.dumps(activity['materials']),
+            'how_to': json.dumps(activity['how_to']),
+            'why_it_helps': activity['why_it_helps'],
+            'duration_min': activity['duration_min'],
+        }
+        for activity in activities
+    ]
+
+
+def pregenerate(activity_date=None, active_days=14, variants=3, batch_size=5000, concurrency=4,
+                use_batches=False, log=print):
+    """
+    Generate and save activity_date's daily activity for every due baby.
+    Returns {'babies', 'groups', 'saved', 'skipped'}. Babies whose group
+    failed to generate are skipped. They get theirs on demand instead.
+    """
+    started = time.perf_counter()
+    activity_date = activity_date or date.today() + timedelta(days=1)
+    babies = database.get_babies_due_daily_activity(activity_date, activity_date - timedelta(days=active_days))
+
+    groups = {}
+    for baby in babies:
+        label, months = age_bucket(baby['age_months'])
+        groups.setdefault((label, months, goals_of(baby)), []).append(baby)
+    log(f"⟳ Pre-generating {activity_date}: {len(babies)} babies in {len(groups)} groups")
+
+    generated = generate_all({
+        key: (ai_service.generate_daily_activities, (key[0], key[1], list(key[2]), variants))
+        for key in groups
+    }, use_batches, concurrency, log)
+
+    rows = []
+    skipped = 0
+    for key, members in groups.items():
+        activities = generated.get(key) or []
+        if not activities:
+            log(f"⚠ No activities generated for {key[0]} / {', '.join(key[2]) or 'no goals'}; "
+                f"{len(members)} babies will generate on demand")
+            skipped += len(members)
+            continue
+        for baby in members:
+            activity = activities[(baby['id'] + activity_date.toordinal()) % len(activities)]
+            rows.append(daily_activity_row(baby['id'], baby['parent_id'], activity_date, key[0], activity))
+
+    saved = 0
+    for start in range(0, len(rows), batch_size):
+        saved += database.save_daily_activities(rows[start:start + batch_size])
+
+    elapsed = time.perf_counter() - started
+    log(f"✓ Pre-generated {saved} daily activities for {activity_date} "
+        f"with {len(groups)} Claude calls in {elapsed:.1f} s")
+    return {'babies': len(babies), 'groups': len(groups), 'saved': saved, 'skipped': skipped}
+
+
+def pregenerate_challenges(num_days=10, concurrency=4, use_batches=False, log=print):
+    """
+    Generate and save the first num_days activities of every challenge that
+    has none. Returns {'challenges', 'saved', 'skipped'}.
+    """
+    started = time.perf_counter()
+    challenges = database.get_challenges_without_activities()
+    log(f"⟳ Pre-generating curricula for {len(challenges)} challenges")
+
+    generated = generate_all({
+        challenge['id']: (ai_service.generate_challenge_daily_activities,
+                          (challenge['duration_days'], challenge['title'], CHALLENGE_AGE_MONTHS, num_days))
+        for challenge in challenges
+    }, use_batches, concurrency, log)
+
+    saved = skipped = 0
+    for challenge in challenges:
+        activities = generated.get(challenge['id'])
+        if not activities:
+            log(f"⚠ No activities generated for {challenge['title']}; it will generate on first view")
+            skipped += 1
+            continue
+        saved += len(database.save_challenge_activities(challenge['id'], challenge_activity_rows(activities)))
+
+    elapsed = time.perf_counter() - started
+    log(f"✓ Pre-generated {saved} challenge activities in {elapsed:.1f} s")
+    return {'challenges': len(challenges), 'saved': saved, 'skipped': skipped}
+
+
+def seconds_until(at, now=None):
+    """Seconds from now until the next local HH:MM."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+
+    @app.cli.command('pregenerate-daily')
+    @click.option('--date', 'activity_date', type=click.DateTime(['%Y-%m-%d']), default=None,
+                  help='Day to fill (default: tomorrow).')
+    @click.option('--at', default=None, help='Keep running and start a run every day at this local HH:MM.')
+    @click.option('--batch/--no-batch', 'use_batches', default=None,
+                  help='Use the Message Batches API (default: PREGENERATE_BATCH_API).')
+    def pregenerate_command(activity_date, at, use_batches):
+        """Pre-generate daily activities for active babies."""
+        config = app.config
+        if use_batches is None:
+            use_batches = config['PREGENERATE_BATCH_API']
+
+        def run(day=None):
+            pregenerate(day, active_days=config['PREGENERATE_ACTIVE_DAYS'],
+                        variants=config['PREGENERATE_VARIANTS'],
+                        batch_size=config['PREGENERATE_BATCH_SIZE'],
+                        concurrency=config['PREGENERATE_CONCURRENCY'],
+                        use_batches=use_batches)
+
+        if not at:
+            run(activity_date.date() if activity_date else None)
+            return
+        while True:
+            wait = seconds_until(at)
+            print(f"⟳ Next pre-generation run in {wait / 3600:.1f} h (at {at})")
+            time.sleep(wait)
+            try:
+                run()
+            except Exception as e:
+                print(f"⚠ Pre-generation failed: {e}")
+
+    @app.cli.command('pregenerate-challenges')
+    @click.option('--days', default=10, show_default=True, help='Days of each curriculum to generate.')
+    @click.option('--batch/--no-batch', 'use_batches', default=None,
+                  help='Use the Message Batches API (default: PREGENERATE_BATCH_API).')
+    def pregenerate_challenges_command(days, use_batches):
+        """Pre-generate the curricula of challenges that have none."""
+        config = app.config
+        pregenerate_challenges(days, concurrency=config['PREGENERATE_CONCURRENCY'],
+                               use_batches=config['PREGENERATE_BATCH_API'] if use_batches is None else use_batches)
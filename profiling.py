@@ -0,0 +1,261 @@
+"""
+Opt-in profiling for running workers.
+
+Everything here is off unless PROFILING_TOKEN is set (from
+NURTURA_PROFILING_TOKEN). Without it, init_app registers no routes and no
+hooks, so a normal deployment pays nothing. With it, every /debug/profile
+request must send the token in an X-Profiling-Token header.
+
+    GET  /debug/profile                       this worker's status (pid, sampler, captures)
+    GET  /debug/profile/flamegraph?seconds=N  folded stacks for the last N seconds
+    POST /debug/profile/cprofile?endpoint=main.home&count=N
+                                              cProfile the next N requests to that endpoint
+    GET  /debug/profile/cprofile              the captured cProfile reports
+
+The flamegraph export is in the folded format that flamegraph.pl,
+speedscope and inferno read. The stack sampler only records threads that
+are serving a request, with the route as the root frame, so idle server
+threads don't drown out the requests. With PROFILING_SAMPLE_HZ set, it runs
+continuously in each worker at that rate and keeps PROFILING_RETAIN_SECONDS
+of history, and an export reads from that history right away. Otherwise an
+export samples for the requested window first.
+
+Each gunicorn worker profiles itself. Every answer includes the worker's
+pid, so repeat a request until it reaches the worker you want.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request
+
+DEFAULT_CONFIG = {
+    'PROFILING_TOKEN': os.environ.get('NURTURA_PROFILING_TOKEN'),
+    'PROFILING_SAMPLE_HZ': 0,
+    'PROFILING_WINDOW_HZ': 100,
+    'PROFILING_RETAIN_SECONDS': 300,
+    'PROFILING_MAX_WINDOW_SECONDS': 60,
+    'PROFILING_MAX_CAPTURES': 20,
+}
+
+# Thread ident -> route label, for the threads that are serving a request.
+_active = {}
+
+bp = Blueprint('profiling', __name__, url_prefix='/debug/profile')
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})"
+
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Samples the stacks of request threads into one bucket per second."""
+
+    def __init__(self, hz, retain_seconds):
+        self.interval = 1 / hz
+        self.buckets = deque(maxlen=retain_seconds)
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frames = sys._current_frames()
+        second = int(time.time())
+        stacks = [(route, frames.get(ident)) for ident, route in list(_active.items())]
+        with self._lock:
+            if not self.buckets or self.buckets[-1][0] != second:
+                self.buckets.append((second, Counter()))
+            bucket = self.buckets[-1][1]
+            for route, frame in stacks:
+                if frame is not None:
+                    bucket[f'{route};{folded_stack(frame)}'] += 1
+                    self.samples += 1
+
+    def folded(self, seconds):
+        since = int(time.time()) - seconds
+        merged = Counter()
+        with self._lock:
+            for second, bucket in self.buckets:
+                if second >= since:
+                    merged.update(bucket)
+        return ''.join(f'{stack} {count}\n' for stack, count in merged.most_common())
+
+
+class Profiler:
+    """Per-app profiling state: the continuous sampler and the cProfile captures."""
+
+    def __init__(self, config):
+        self.config = config
+        self.sampler = None
+        self.armed = {}
+        self.captures = deque(maxlen=config['PROFILING_MAX_CAPTURES'])
+        self._lock = threading.Lock()
+        # Only one cProfile can be active per interpreter.
+        self._cprofile_lock = threading.Lock()
+
+    def ensure_sampler(self):
+        """Start the continuous sampler in this worker (threads don't survive fork)."""
+        hz = self.config['PROFILING_SAMPLE_HZ']
+        if hz and (self.sampler is None or not self.sampler.is_running()):
+            with self._lock:
+                if self.sampler is None or not self.sampler.is_running():
+                    self.sampler = Sampler(hz, self.config['PROFILING_RETAIN_SECONDS']).start()
+
+    def take_capture(self, endpoint):
+        with self._lock:
+            remaining = self.armed.get(endpoint, 0)
+            if not remaining or not self._cprofile_lock.acquire(blocking=False):
+                return False
+            if remaining == 1:
+                del self.armed[endpoint]
+            else:
+                self.armed[endpoint] = remaining - 1
+            return True
+
+
+def _profiler():
+    return current_app.extensions['profiling']
+
+
+def _route_label():
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return f'{request.method} {rule}'
+
+
+def _begin_request():
+    profiler = _profiler()
+    profiler.ensure_sampler()
+    if request.blueprint == bp.name:
+        return
+    if request.environ.get('nurtura.async_view'):
+        # asgi.py runs this request's steps on whichever pool thread is free,
+        # so neither a per-thread label nor a cProfile capture can follow it.
+        return
+    _active[threading.get_ident()] = _route_label()
+    if profiler.armed and profiler.take_capture(request.endpoint):
+        g.cprofile = cProfile.Profile()
+        g.cprofile_started = time.perf_counter()
+        g.cprofile.enable()
+
+
+def _end_request(exc):
+    _active.pop(threading.get_ident(), None)
+    profile = g.pop('cprofile', None)
+    if profile is None:
+        return
+    profile.disable()
+    profiler = _profiler()
+    profiler._cprofile_lock.release()
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(40)
+    profiler.captures.append({
+        'endpoint': request.endpoint,
+        'path': request.full_path.rstrip('?'),
+        'ms': round((time.perf_counter() - g.pop('cprofile_started')) * 1000, 1),
+        'captured_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'report': report.getvalue(),
+    })
+
+
+def require_token():
+    """before_request hook for the /debug endpoints."""
+    token = current_app.config['PROFILING_TOKEN']
+    sent = request.headers.get('X-Profiling-Token', '')
+    if not hmac.compare_digest(sent.encode(), token.encode()):
+        abort(403)
+
+
+bp.before_request(require_token)
+
+
+@bp.route('')
+def status():
+    profiler = _profiler()
+    sampler = profiler.sampler
+    return jsonify({
+        'pid': os.getpid(),
+        'continuous_sampler': {
+            'hz': profiler.config['PROFILING_SAMPLE_HZ'],
+            'running': bool(sampler and sampler.is_running()),
+            'samples': sampler.samples if sampler else 0,
+            'retained_seconds': len(sampler.buckets) if sampler else 0,
+        },
+        'armed': profiler.armed,
+        'captures': len(profiler.captures),
+    })
+
+
+@bp.route('/flamegraph')
+def flamegraph():
+    profiler = _profiler()
+    max_seconds = profiler.config['PROFILING_MAX_WINDOW_SECONDS']
+    seconds = min(max(request.args.get('seconds', 10, type=int), 1), max_seconds)
+    sampler = profiler.sampler
+    if sampler is not None and sampler.is_running():
+        folded = sampler.folded(seconds)
+    else:
+        window = Sampler(profiler.config['PROFILING_WINDOW_HZ'], seconds + 1).start()
+        time.sleep(seconds)
+        window.stop()
+        folded = window.folded(seconds + 1)
+    return Response(folded, mimetype='text/plain',
+                    headers={'X-Worker-Pid': str(os.getpid()),
+                             'Content-Disposition': f'inline; filename="worker-{os.getpid()}.folded"'})
+
+
+@bp.route('/cprofile', methods=['GET', 'POST'])
+def cprofile():
+    profiler = _profiler()
+    if request.method == 'POST':
+        endpoint = request.args.get('endpoint', '')
+        if endpoint not in current_app.view_functions:
+            return jsonify({'status': 'error', 'message': f'Unknown endpoint {endpoint!r}'}), 400
+        with profiler._lock:
+            profiler.armed[endpoint] = min(max(request.args.get('count', 1, type=int), 1),
+                                           profiler.config['PROFILING_MAX_CAPTURES'])
+        return jsonify({'status': 'success', 'pid': os.getpid(), 'armed': profiler.armed})
+    return jsonify({'pid': os.getpid(), 'captures': list(profiler.captures)})
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['PROFILING_TOKEN']:
+        return
+
+    app.extensions['profiling'] = Profiler(app.config)
+    app.before_request(_begin_request)
+    app.teardown_request(_end_request)
+    app.register_blueprint(bp)
@@ -0,0 +1,289 @@
+"""
+Query timing and slow-query log for the data layer.
+
+Each app's storage backend hands out timed connections. Every statement
+records its fingerprint (the SQL with literals replaced by ? and whitespace
+collapsed), its duration and its row count. For a SELECT the duration covers
+both execute and fetch. Totals are kept per fingerprint in the worker.
+
+A statement that takes QUERY_LOG_SLOW_MS or longer is printed along with its
+query plan. The plan comes from EXPLAIN QUERY PLAN on SQLite and EXPLAIN on
+Postgres, and is taken once per fingerprint. The most recent slow statements
+are kept with their parameters.
+
+    GET  /debug/queries?top=20&sort=total_ms  the top fingerprints plus recent slow statements
+    POST /debug/queries/reset                 clear this worker's totals
+
+Like /debug/profile, the endpoint exists only when NURTURA_PROFILING_TOKEN is
+set, and it requires the same X-Profiling-Token header. The timing itself is
+on unless QUERY_LOG is False.
+"""
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from flask import Blueprint, current_app, jsonify, request
+
+import profiling
+
+DEFAULT_CONFIG = {
+    'QUERY_LOG': True,
+    'QUERY_LOG_SLOW_MS': 50,
+    'QUERY_LOG_RECENT_SLOW': 50,
+}
+
+SORT_KEYS = ('total_ms', 'calls', 'mean_ms', 'max_ms', 'rows')
+
+bp = Blueprint('query_log', __name__, url_prefix='/debug/queries')
+
+
+# ======================
+# FINGERPRINTS
+# ======================
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """The statement with literals and IN lists folded, so one query shape is one entry."""
+    text = _STRING.sub('?', sql)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(...)', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+# ======================
+# AGGREGATION
+# ======================
+
+class QueryLog:
+    """Per-fingerprint totals and the recent slow statements of one backend."""
+
+    def __init__(self, slow_ms=50, recent_slow=50, log=print):
+        self.slow_seconds = slow_ms / 1000
+        self.log = log
+        self.stats = {}
+        self.plans = {}
+        self.slow = deque(maxlen=recent_slow)
+        self.since = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, sql, seconds, rows, params=None, explain=None):
+        """
+        Count one statement. `explain` is called with no arguments to get the
+        plan as a list of lines. That only happens when the statement is slow
+        and its fingerprint has no plan yet.
+        """
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0}
+            ms = seconds * 1000
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += max(rows, 0)
+            if seconds < self.slow_seconds:
+                return
+            entry['slow'] += 1
+            plan = self.plans.get(key)
+        if plan is None and explain is not None:
+            try:
+                plan = explain()
+            except Exception as e:
+                plan = [f'(no plan: {e})']
+            with self._lock:
+                self.plans[key] = plan
+        with self._lock:
+            self.slow.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'ms': round(ms, 1),
+                'rows': rows,
+                'fingerprint': key,
+                'params': repr(params)[:200] if params is not None else None,
+            })
+        self.log(f"⚠ Slow query ({ms:.1f} ms, {rows} rows): {key}")
+        for line in plan or ():
+            self.log(f"    {line}")
+
+    def top(self, n=20, sort='total_ms'):
+        with self._lock:
+            entries = [dict(entry, fingerprint=key, plan=self.plans.get(key))
+                       for key, entry in self.stats.items()]
+            slow = list(self.slow)
+        for entry in entries:
+            entry['mean_ms'] = entry['total_ms'] / entry['calls']
+            for field in ('total_ms', 'mean_ms', 'max_ms'):
+                entry[field] = round(entry[field], 3)
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return {'since': datetime.fromtimestamp(self.since).isoformat(timespec='seconds'),
+                'fingerprints': len(entries), 'top': entries[:n], 'recent_slow': slow}
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.plans.clear()
+            self.slow.clear()
+            self.since = time.time()
+
+
+# ======================
+# SQLITE CONNECTIONS
+# ======================
+# sqlite3's set_trace_callback only reports that a statement started, with
+# no duration or row count. So the backend instead opens connections of a
+# sqlite3.Connection subclass whose cursors time themselves. A SELECT is
+# recorded when its cursor is exhausted, re-executed, closed or released, so
+# the time spent fetching rows counts too.
+
+def sqlite_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN as indented lines."""
+    rows = sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+class TimedCursor(sqlite3.Cursor):
+    _pending = None
+
+    def _start(self, sql, params, seconds):
+        self._finish()
+        rows = self.rowcount if self.description is None else 0
+        self._pending = [sql, params, seconds, rows]
+        if self.description is None:
+            self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows = pending
+        conn = self.connection
+        # executemany has no single parameter set, so its plan binds NULLs.
+        plan_params = (None,) * sql.count('?') if params is None else params
+        conn.query_log.record(sql, seconds, rows, params=params,
+                              explain=lambda: sqlite_plan(conn, sql, plan_params))
+
+    def _fetched(self, seconds, rows, done):
+        if self._pending is not None:
+            self._pending[2] += seconds
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._start(sql, parameters, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._start(sql, None, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - started, 0, True)
+            raise
+        self._fetched(time.perf_counter() - started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.Connection whose execute shortcuts go through TimedCursor."""
+    query_log = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ======================
+# ADMIN ENDPOINT
+# ======================
+
+def get_query_log():
+    return current_app.extensions['storage'].query_log
+
+
+bp.before_request(profiling.require_token)
+
+
+@bp.route('')
+def top_queries():
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SORT_KEYS:
+        return jsonify({'status': 'error', 'message': f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    top = min(max(request.args.get('top', 20, type=int), 1), 500)
+    return jsonify(get_query_log().top(top, sort))
+
+
+@bp.route('/reset', methods=['POST'])
+def reset():
+    get_query_log().reset()
+    return jsonify({'status': 'success'})
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['QUERY_LOG']:
+        return
+
+    backend = app.extensions['storage']
+    backend.query_log = QueryLog(app.config['QUERY_LOG_SLOW_MS'], app.config['QUERY_LOG_RECENT_SLOW'])
+    if backend.name.startswith('sqlite'):
+        backend.connection_factory = type('TimedConnection', (TimedConnection,), {'query_log': backend.query_log})
+    if app.config.get('PROFILING_TOKEN'):
+        app.register_blueprint(bp)
@@ -0,0 +1,313 @@
+"""
+Deterministic synthetic data at production scale, for benchmarks and load tests.
+
+Fills every table init_db creates with plausible rows, using bulk inserts
+(database.insert_many) in chunks and no network. --scale 1 is about 100k
+parents, 150k babies, 1.2M development areas, 1M area activities and 10M
+task completions over --days of history. The same seed, scale, days and
+`today` always produce the same rows.
+
+    python synthetic_data.py [--database URL] [--scale F] [--seed N] [--days N]
+
+The database is migrated first and must have no parents yet. From code
+(inside an app context, or against NURTURA_DATABASE_URL):
+
+    import synthetic_data
+    dataset = synthetic_data.generate(scale=0.01)
+    dataset['baby_uuids'], dataset['parent_contacts'], ...
+"""
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import database
+
+SCALE_1 = {
+    'parents': 100_000,
+    'task_completions': 10_000_000,
+}
+
+BABIES_PER_PARENT = {1: 60, 2: 30, 3: 10}
+
+# (age_group, youngest month, oldest month, share of babies)
+AGE_GROUPS = [
+    ('0–3 Months', 0, 2, 15),
+    ('3–6 Months', 3, 5, 18),
+    ('6–12 Months', 6, 11, 25),
+    ('1–2 Years', 12, 23, 22),
+    ('2–4 Years', 24, 47, 14),
+    ('4–6 Years', 48, 71, 6),
+]
+
+DEVELOPMENT_TYPES = ['Physical', 'Cognitive', 'Linguistic', 'Social-Emotional']
+AREAS_PER_BABY = 8
+ACTIVITIES_PER_AREA = 4
+# Activities are generated on the first visit to an area, and most areas
+# are never opened.
+VISITED_AREA_RATE = 0.21
+
+# Share of completions per hour of the day: morning and after-work peaks,
+# almost nothing overnight.
+HOURLY_PATTERN = [1, 0, 0, 0, 0, 1, 4, 9, 11, 9, 6, 5, 4, 4, 4, 5, 6, 8, 10, 9, 6, 3, 2, 1]
+WEEKEND_BOOST = 1.3
+
+ENROLLMENT_RATE = 0.3
+CHALLENGE_DURATIONS = (30, 90, 180, 365)
+CHALLENGE_PREVIEW_DAYS = 10
+DAILY_ACTIVITY_RATE = 0.05
+DAILY_ACTIVITY_DAYS = 14
+LEGACY_USER_RATE = 0.01
+LEGACY_BABY_RATE = 0.02
+
+CHUNK = 10_000
+
+
+def _insert(table, columns, rows, log):
+    """Insert a (possibly huge) row iterator in CHUNK-sized transactions. Returns the ids."""
+    ids = []
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK:
+            ids.extend(database.insert_many(table, columns, batch))
+            batch = []
+    if batch:
+        ids.extend(database.insert_many(table, columns, batch))
+    log(f"✓ {table}: {len(ids):,} rows")
+    return ids
+
+
+def _timestamp(day, rng, hour=None):
+    hour = rng.randrange(24) if hour is None else hour
+    return f'{day.isoformat()} {hour:02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}'
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate(scale=0.01, seed=42, days=90, today=None, log=print):
+    """
+    Fill an empty, migrated database. Returns the keys benchmarks and load
+    tests pick from: parent_contacts, baby_uuids, baby_ids, area_ids,
+    activity_ids, activities_by_baby, area_of_activity, challenge_ids,
+    enrollment_ids and the row counts.
+    """
+    conn = database.get_db_connection()
+    existing = conn.execute('SELECT COUNT(*) FROM parents').fetchone()[0]
+    conn.close()
+    if existing:
+        raise ValueError(f'synthetic_data needs an empty database, found {existing} parents')
+
+    rng = random.Random(seed)
+    today = today or datetime.now(timezone.utc).date()
+    history = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    counts = {}
+
+    # Parents and babies
+    parent_count = max(int(SCALE_1['parents'] * scale), 1)
+    parent_contacts = [f'parent{i}@example.test' if i % 3 else f'+1555{i:07d}' for i in range(parent_count)]
+    parent_ids = _insert('parents', ('contact_type', 'contact_value', 'created_at'), (
+        ('email' if '@' in contact else 'mobile', contact, _timestamp(history[0] - timedelta(days=rng.randrange(365)), rng))
+        for contact in parent_contacts
+    ), log)
+
+    sizes, size_weights = zip(*BABIES_PER_PARENT.items())
+    group_weights = [group[3] for group in AGE_GROUPS]
+    babies = []
+    for parent_id in parent_ids:
+        for _ in range(rng.choices(sizes, size_weights)[0]):
+            group, youngest, oldest, _share = rng.choices(AGE_GROUPS, group_weights)[0]
+            age_months = rng.randint(youngest, oldest)
+            goals = rng.sample(DEVELOPMENT_TYPES, rng.randint(1, len(DEVELOPMENT_TYPES)))
+            babies.append((parent_id, f'Baby {len(babies) + 1}', age_months, group, goals, _uuid(rng)))
+    baby_ids = _insert('babies', (
+        'parent_id', 'baby_name', 'age_months', 'date_of_birth', 'age_group', 'development_goals', 'baby_uuid', 'created_at'
+    ), (
+        (parent_id, name, age_months, (today - timedelta(days=age_months * 30 + 15)).isoformat(), group,
+         json.dumps(goals), baby_uuid, _timestamp(history[0] - timedelta(days=rng.randrange(30)), rng))
+        for parent_id, name, age_months, group, goals, baby_uuid in babies
+    ), log)
+
+    # Development areas, with activities for the visited ones
+    area_rows = []
+    for baby_id, baby in zip(baby_ids, babies):
+        age_months = baby[2]
+        for index in range(AREAS_PER_BABY):
+            development_type = DEVELOPMENT_TYPES[index % len(DEVELOPMENT_TYPES)]
+            area_rows.append((baby_id, f'{development_type} Adventure {index + 1}', development_type,
+                              max(age_months - 3, 0), age_months + 3))
+    area_ids = _insert('development_areas', (
+        'baby_id', 'area_name', 'development_type', 'age_range_min', 'age_range_max', 'description', 'now_playing'
+    ), (
+        row + ('Playful moments that help your little one explore and grow.', rng.randint(101, 999))
+        for row in area_rows
+    ), log)
+
+    visited = [(area_id, row[0]) for area_id, row in zip(area_ids, area_rows) if rng.random() < VISITED_AREA_RATE]
+    activity_ids = _insert('area_activities', (
+        'area_id', 'activity_title', 'short_description', 'materials', 'how_to', 'duration_min',
+        'why_it_helps', 'safety_notes', 'reflection_prompt', 'activity_icon'
+    ), (
+        (area_id, f'Giggle Game {n + 1}', 'A gentle, joyful game to share on a cosy blanket.',
+         json.dumps(['Soft blanket', 'Favourite toy']), json.dumps(['Smile', 'Narrate', 'Follow their lead']),
+         rng.choice((5, 8, 10, 12, 15)), 'Builds language and trust.', 'Always supervise.',
+         'What made your baby light up?', rng.choice('🎵🧸🎨🌈🐣'))
+        for area_id, _baby_id in visited for n in range(ACTIVITIES_PER_AREA)
+    ), log)
+
+    area_of_activity = {}
+    activities_by_baby = {}
+    for index, activity_id in enumerate(activity_ids):
+        area_id, baby_id = visited[index // ACTIVITIES_PER_AREA]
+        area_of_activity[activity_id] = area_id
+        activities_by_baby.setdefault(baby_id, []).append(activity_id)
+
+    # Task completions: a few very engaged families do most of the tapping,
+    # on the daily and weekly rhythm above.
+    active_babies = list(activities_by_baby)
+    engagement = [rng.paretovariate(1.5) for _ in active_babies]
+    day_weights = [WEEKEND_BOOST if day.weekday() >= 5 else 1 for day in history]
+    completion_count = int(SCALE_1['task_completions'] * scale) if active_babies else 0
+
+    def completions():
+        remaining = completion_count
+        while remaining:
+            n = min(remaining, CHUNK)
+            picks = zip(rng.choices(active_babies, engagement, k=n),
+                        rng.choices(history, day_weights, k=n),
+                        rng.choices(range(24), HOURLY_PATTERN, k=n))
+            for baby_id, day, hour in picks:
+                activity_id = rng.choice(activities_by_baby[baby_id])
+                yield baby_id, activity_id, area_of_activity[activity_id], _timestamp(day, rng, hour)
+            remaining -= n
+    counts['task_completions'] = len(_insert(
+        'task_completions', ('baby_id', 'activity_id', 'area_id', 'completed_at'), completions(), log
+    ))
+
+    # Challenges: the shared templates, their previews, enrollments and day logs
+    challenge_ids = database.save_challenges([
+        {'duration_days': duration, 'title': f'{duration}-Day Connection Quest', 'tagline': 'Build Curiosity & Wonder',
+         'description': 'A daily ritual of small, joyful moments.', 'cover_image': '🌟',
+         'development_types': DEVELOPMENT_TYPES}
+        for duration in CHALLENGE_DURATIONS
+    ])
+    log(f"✓ challenges: {len(challenge_ids)} rows")
+    challenge_activity_ids = {}
+    for challenge_id in challenge_ids:
+        challenge_activity_ids[challenge_id] = database.save_challenge_activities(challenge_id, [
+            {'day_number': day, 'activity_title': f'Day {day}: Morning Cuddle & Song',
+             'activity_description': 'Start the day with cuddles and a favourite song.',
+             'materials': json.dumps(['Your voice']), 'how_to': json.dumps(['Sing slowly']),
+             'why_it_helps': 'Builds emotional security.', 'duration_min': 10}
+            for day in range(1, CHALLENGE_PREVIEW_DAYS + 1)
+        ])
+
+    enrollments = []
+    logs = []
+    durations = dict(zip(challenge_ids, CHALLENGE_DURATIONS))
+    for baby_id in rng.sample(baby_ids, int(len(baby_ids) * ENROLLMENT_RATE)):
+        challenge_id = rng.choice(challenge_ids)
+        started = rng.choice(history)
+        elapsed = min((today - started).days + 1, durations[challenge_id])
+        adherence = rng.uniform(0.3, 0.95)
+        logged = [day for day in range(1, elapsed + 1) if rng.random() < adherence]
+        status = 'completed' if len(logged) == durations[challenge_id] else 'active'
+        enrollments.append((baby_id, challenge_id, _timestamp(started, rng), len(logged),
+                            logged[-1] if logged else 0, status))
+        logs.append((challenge_id, started, logged))
+    enrollment_ids = _insert('challenge_enrollments', (
+        'baby_id', 'challenge_id', 'started_at', 'completed_days', 'last_logged_day', 'status'
+    ), enrollments, log)
+    _insert('challenge_daily_logs', ('enrollment_id', 'day_number', 'activity_id', 'completed_at'), (
+        (enrollment_id, day,
+         challenge_activity_ids[challenge_id][day - 1] if day <= CHALLENGE_PREVIEW_DAYS else 0,
+         _timestamp(started + timedelta(days=day - 1), rng))
+        for enrollment_id, (challenge_id, started, logged) in zip(enrollment_ids, logs) for day in logged
+    ), log)
+
+    # Daily activities of the day (a small opt-in cohort) and their completions
+    daily_babies = [(baby_id, baby[0], baby[3]) for baby_id, baby in zip(baby_ids, babies)
+                    if rng.random() < DAILY_ACTIVITY_RATE]
+    daily_rows = [(baby_id, parent_id, day, group) for baby_id, parent_id, group in daily_babies
+                  for day in history[-DAILY_ACTIVITY_DAYS:]]
+    daily_ids = _insert('daily_activities', (
+        'baby_id', 'parent_id', 'activity_date', 'title', 'short_teaser', 'what_you_need',
+        'full_instructions', 'why_it_matters', 'tips', 'age_range', 'goal_focus', 'domain'
+    ), (
+        (baby_id, parent_id, day.isoformat(), 'Peekaboo Surprise', 'Hide, pause, reveal!', 'A light scarf',
+         'Hide your face, pause, then reveal with a smile.', 'Object permanence.', 'Keep it slow.',
+         group, 'Cognitive', 'Cognitive')
+        for baby_id, parent_id, day, group in daily_rows
+    ), log)
+    _insert('activity_completions', ('daily_activity_id', 'baby_id', 'parent_id', 'completed_at'), (
+        (daily_id, baby_id, parent_id, _timestamp(day, rng))
+        for daily_id, (baby_id, parent_id, day, _group) in zip(daily_ids, daily_rows) if rng.random() < 0.5
+    ), log)
+
+    # Tables from the pre-parent architecture, which older databases still hold
+    _insert('users', ('email', 'password', 'parent_name'), (
+        (f'user{i}@example.test', 'pbkdf2:sha256:synthetic', f'Parent {i}')
+        for i in range(int(parent_count * LEGACY_USER_RATE))
+    ), log)
+    question_ids = _insert('ability_questions', (
+        'domain', 'question_text', 'age_range_min', 'age_range_max', 'helpful_hint'
+    ), (
+        (domain, f'Can your baby {verb}?', youngest, oldest, 'Watch during play.')
+        for domain in DEVELOPMENT_TYPES for verb in ('reach for toys', 'babble back', 'smile at you')
+        for _group, youngest, oldest, _share in AGE_GROUPS
+    ), log)
+    legacy_babies = rng.sample(baby_ids, int(len(baby_ids) * LEGACY_BABY_RATE))
+    _insert('ability_assessments', ('baby_id', 'question_id', 'response'), (
+        (baby_id, rng.choice(question_ids), rng.choice(('yes', 'sometimes', 'not yet')))
+        for baby_id in legacy_babies for _ in range(4)
+    ), log)
+    _insert('personalized_activities', ('baby_id', 'title', 'description', 'target_domain', 'duration_min'), (
+        (baby_id, 'Tummy Time Tunes', 'Sing while your baby plays on their tummy.', rng.choice(DEVELOPMENT_TYPES), 10)
+        for baby_id in legacy_babies for _ in range(3)
+    ), log)
+    conn = database.get_db_connection()
+    seeded_activities = [row[0] for row in conn.execute('SELECT id FROM activities').fetchall()]
+    conn.close()
+    if seeded_activities:
+        _insert('completed_activities', ('baby_id', 'activity_id', 'completed_at'), (
+            (baby_id, rng.choice(seeded_activities), _timestamp(rng.choice(history), rng))
+            for baby_id in legacy_babies for _ in range(3)
+        ), log)
+
+    counts.update({
+        'parents': len(parent_ids),
+        'babies': len(baby_ids),
+        'development_areas': len(area_ids),
+        'area_activities': len(activity_ids),
+        'challenge_enrollments': len(enrollment_ids),
+    })
+    return {
+        'counts': counts,
+        'parent_contacts': parent_contacts,
+        'baby_uuids': [baby[5] for baby in babies],
+        'baby_ids': baby_ids,
+        'area_ids': area_ids,
+        'activity_ids': activity_ids,
+        'activities_by_baby': activities_by_baby,
+        'area_of_activity': area_of_activity,
+        'challenge_ids': challenge_ids,
+        'enrollment_ids': enrollment_ids,
+    }
+
+
+if __name__ == '__main__':
+    def arg(name, default, cast=str):
+        return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+    if '--database' in sys.argv:
+        os.environ['NURTURA_DATABASE_URL'] = arg('--database', None)
+
+    import migrations
+    migrations.migrate()
+    started = datetime.now()
+    generate(scale=arg('--scale', 0.01, float), seed=arg('--seed', 42, int), days=arg('--days', 90, int))
+    print(f"✓ Synthetic data generated in {(datetime.now() - started).total_seconds():.1f} s")
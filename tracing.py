@@ -0,0 +1,356 @@
+"""
+Per-request tracing with OpenTelemetry spans, exported to a local file.
+
+Tracing is off unless TRACING is set (NURTURA_TRACING=1). When it is on,
+every request becomes a trace. The route gets a SERVER span. Each database
+helper and each ai_service call made while serving it gets a child span,
+and so does every app helper marked @tracing.traced. When the request
+finishes, its spans are appended to TRACING_FILE as JSON lines, in the
+format the OpenTelemetry SDK's ConsoleSpanExporter writes. With
+TRACING_CONSOLE, they are also printed as a waterfall:
+
+    ⟳ trace 4bf92f3577b34da6a3ce929d0e0e4736  POST /api/generate-content  812.4 ms
+          0.0    812.4  POST /api/generate-content
+          0.2      0.3    database.get_baby_by_uuid
+          0.6      0.2    database.get_development_areas
+          0.9    603.0    ai_service.generate_development_areas
+        ...
+
+If opentelemetry-sdk is installed, spans come from a real TracerProvider,
+so it can take more exporters (OTLP, for example). Otherwise a small
+built-in tracer records the same fields. An incoming W3C traceparent header
+continues the caller's trace, and every response carries X-Trace-Id.
+
+    python tracing.py traces.jsonl [TRACE_ID]   waterfall for the traces in a file
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+
+DEFAULT_CONFIG = {
+    'TRACING': os.environ.get('NURTURA_TRACING', '0') == '1',
+    'TRACING_FILE': os.environ.get('NURTURA_TRACING_FILE', 'traces.jsonl'),
+    'TRACING_CONSOLE': True,
+}
+
+SERVICE_NAME = 'nurtura'
+
+# Module functions that are plumbing or pure helpers, not steps worth a span.
+UNTRACED = {
+    'get_db_connection', 'get_backend', 'backend_from_url', 'dialect', 'default_database_url',
+    'init_app', 'get_client', 'get_async_client', 'run_call', 'run_call_async', 'claude_call',
+    'create_message', 'create_message_async', 'current_limiter',
+    'age_group_to_months', 'challenge_day_number', 'with_challenge_progress',
+}
+
+# The tracer of the app serving the current request, or None outside a traced request.
+_tracer = contextvars.ContextVar('nurtura_tracer', default=None)
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+def _iso(ns):
+    return datetime.fromtimestamp(ns / 1e9, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _parse_time(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc).timestamp()
+
+
+# ======================
+# BUILT-IN TRACER
+# ======================
+# Used when opentelemetry-sdk isn't installed. Spans are kept per trace and
+# exported together when the local root span ends.
+
+class _Span:
+    def __init__(self, name, kind, trace_id, parent_id, attributes, spans):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = {'status_code': 'UNSET'}
+        self.spans = spans
+        self.start_ns = time.time_ns()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc):
+        self.events.append({'name': 'exception', 'timestamp': _iso(time.time_ns()), 'attributes': {
+            'exception.type': type(exc).__name__, 'exception.message': str(exc)}})
+        self.status = {'status_code': 'ERROR', 'description': f'{type(exc).__name__}: {exc}'}
+
+    def to_dict(self, end_ns):
+        return {
+            'name': self.name,
+            'context': {'trace_id': f'0x{self.trace_id}', 'span_id': f'0x{self.span_id}', 'trace_state': '[]'},
+            'kind': f'SpanKind.{self.kind}',
+            'parent_id': f'0x{self.parent_id}' if self.parent_id else None,
+            'start_time': _iso(self.start_ns),
+            'end_time': _iso(end_ns),
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': self.events,
+            'links': [],
+            'resource': {'attributes': {'service.name': SERVICE_NAME}, 'schema_url': ''},
+        }
+
+
+class BuiltinTracer:
+    def __init__(self, export):
+        self.export = export
+        self._current = contextvars.ContextVar('nurtura_span', default=None)
+
+    @contextmanager
+    def span(self, name, kind='INTERNAL', attributes=None, headers=None):
+        parent = self._current.get()
+        if parent is not None:
+            span = _Span(name, kind, parent.trace_id, parent.span_id, attributes, parent.spans)
+        else:
+            match = _TRACEPARENT.match((headers or {}).get('traceparent', ''))
+            trace_id, parent_id = match.groups() if match else (secrets.token_hex(16), None)
+            span = _Span(name, kind, trace_id, parent_id, attributes, [])
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self._current.reset(token)
+            span.spans.append(span.to_dict(time.time_ns()))
+            if parent is None:
+                self.export(span.spans)
+
+    def trace_id(self, span):
+        return span.trace_id
+
+
+# ======================
+# OPENTELEMETRY SDK
+# ======================
+
+def _sdk_tracer_class():
+    """OTelTracer if opentelemetry-sdk is installed, else None."""
+    try:
+        from opentelemetry import propagate, trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+    except ImportError:
+        return None
+
+    class TraceExporter(SpanExporter):
+        """Collects finished spans by trace and hands over each trace when its local root ends."""
+
+        def __init__(self, export):
+            self.export_trace = export
+            self.pending = defaultdict(list)
+            self.lock = threading.Lock()
+
+        def export(self, spans):
+            for span in spans:
+                with self.lock:
+                    self.pending[span.context.trace_id].append(json.loads(span.to_json(indent=None)))
+                    done = span.parent is None or span.parent.is_remote
+                    finished = self.pending.pop(span.context.trace_id) if done else None
+                if finished:
+                    self.export_trace(finished)
+            return SpanExportResult.SUCCESS
+
+    class OTelTracer:
+        def __init__(self, export):
+            self.provider = TracerProvider(resource=Resource.create({'service.name': SERVICE_NAME}))
+            self.provider.add_span_processor(SimpleSpanProcessor(TraceExporter(export)))
+            self._tracer = self.provider.get_tracer(__name__)
+
+        @contextmanager
+        def span(self, name, kind='INTERNAL', attributes=None, headers=None):
+            context = propagate.extract(headers) if headers is not None else None
+            with self._tracer.start_as_current_span(name, context=context, kind=trace.SpanKind[kind],
+                                                    attributes=attributes) as span:
+                yield span
+
+        def trace_id(self, span):
+            return format(span.get_span_context().trace_id, '032x')
+
+    return OTelTracer
+
+
+# ======================
+# EXPORT
+# ======================
+
+def waterfall(spans):
+    """Lines showing each span's offset and duration (ms), indented under its parent."""
+    by_id = {span['context']['span_id']: span for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in sorted(spans, key=lambda span: span['start_time']):
+        parent = span['parent_id']
+        (children[parent] if parent in by_id else roots).append(span)
+    if not roots:
+        return []
+    origin = _parse_time(roots[0]['start_time'])
+    lines = []
+
+    def walk(span, depth):
+        start = _parse_time(span['start_time'])
+        duration = (_parse_time(span['end_time']) - start) * 1000
+        error = '  ✗ ' + span['status'].get('description', 'error') if span['status']['status_code'] == 'ERROR' else ''
+        lines.append(f"{(start - origin) * 1000:>9.1f}{duration:>9.1f}  {'  ' * depth}{span['name']}{error}")
+        for child in children[span['context']['span_id']]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return lines
+
+
+def file_exporter(path, console):
+    """An export function that appends a trace's spans to `path` and optionally prints its waterfall."""
+    lock = threading.Lock()
+
+    def export(spans):
+        if path:
+            with lock, open(path, 'a') as f:
+                f.writelines(json.dumps(span) + '\n' for span in spans)
+        if console:
+            root = spans[-1]
+            duration = (_parse_time(root['end_time']) - _parse_time(root['start_time'])) * 1000
+            print('\n'.join([f"⟳ trace {root['context']['trace_id'][2:]}  {root['name']}  {duration:.1f} ms"]
+                            + waterfall(spans)))
+
+    return export
+
+
+# ======================
+# INSTRUMENTATION
+# ======================
+
+def traced(fn=None, *, name=None, kind='INTERNAL', attributes=None):
+    """Give each call of fn its own span while a traced request is running."""
+    if fn is None:
+        return functools.partial(traced, name=name, kind=kind, attributes=attributes)
+    span_name = name or f'{fn.__module__}.{fn.__qualname__}'
+    span_attributes = {'code.namespace': fn.__module__, 'code.function': fn.__qualname__, **(attributes or {})}
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            tracer = _tracer.get()
+            if tracer is None:
+                return await fn(*args, **kwargs)
+            with tracer.span(span_name, kind, span_attributes):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer.get()
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, kind, span_attributes):
+                return fn(*args, **kwargs)
+
+    if hasattr(fn, 'aio'):
+        # The async twin of an ai_service call (see ai_service.claude_call).
+        wrapper.aio = traced(fn.aio, name=span_name, kind=kind, attributes=attributes)
+    wrapper.traced = True
+    return wrapper
+
+
+def instrument(module, kind='INTERNAL', attributes=None):
+    """Wrap each public function defined in `module` with traced()."""
+    for name, value in list(vars(module).items()):
+        if (inspect.isfunction(value) and value.__module__ == module.__name__ and not name.startswith('_')
+                and name not in UNTRACED and not getattr(value, 'traced', False)):
+            setattr(module, name, traced(value, kind=kind, attributes=attributes))
+
+
+def _begin_request():
+    tracer = g.tracer = current_app.extensions['tracing']
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace_scope = tracer.span(f'{request.method} {rule}', 'SERVER', {
+        'http.request.method': request.method,
+        'http.route': rule,
+        'url.path': request.path,
+    }, headers={key.lower(): value for key, value in request.headers.items()})
+    g.trace_span = g.trace_scope.__enter__()
+    g.trace_token = _tracer.set(tracer)
+
+
+def _tag_response(response):
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute('http.response.status_code', response.status_code)
+        response.headers['X-Trace-Id'] = g.tracer.trace_id(span)
+    return response
+
+
+def _end_request(exc):
+    scope = g.pop('trace_scope', None)
+    if scope is None:
+        return
+    _tracer.reset(g.pop('trace_token'))
+    if exc is None:
+        scope.__exit__(None, None, None)
+    else:
+        scope.__exit__(type(exc), exc, exc.__traceback__)
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['TRACING']:
+        return
+
+    import ai_service
+    import database
+    instrument(database)
+    instrument(ai_service, kind='CLIENT', attributes={'gen_ai.system': 'anthropic'})
+
+    tracer_class = _sdk_tracer_class() or BuiltinTracer
+    app.extensions['tracing'] = tracer_class(file_exporter(app.config['TRACING_FILE'], app.config['TRACING_CONSOLE']))
+    app.before_request(_begin_request)
+    app.after_request(_tag_response)
+    app.teardown_request(_end_request)
+    print(f"✓ Tracing to {app.config['TRACING_FILE'] or 'console'} ({tracer_class.__name__})")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    traces = defaultdict(list)
+    with open(sys.argv[1]) as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span['context']['trace_id'][2:]].append(span)
+    for trace_id, spans in traces.items():
+        if len(sys.argv) > 2 and not trace_id.startswith(sys.argv[2]):
+            continue
+        root = min(spans, key=lambda span: span['start_time'])
+        print(f"⟳ trace {trace_id}  {root['name']}  {root['start_time']}")
+        print('\n'.join(waterfall(spans)))
+        print()
+
+
+if __name__ == '__main__':
+    main()